@@ -0,0 +1,196 @@
+import math
+import threading
+from collections import deque
+import numpy as np
+from sqlalchemy import text
+
+class RiskStats:
+    """
+    Risk metrics for one scope (all pairs or a single pair), updated in O(1) per trade.
+
+    Returns are per-trade percentage changes, so Sharpe and Sortino are per-trade ratios
+    (mean over standard or downside deviation), not annualized figures.
+    """
+
+    def __init__(self):
+        self.trade_count = 0
+        self.win_count = 0
+        self.equity = 0.0  # Cumulative profit/loss
+        self.peak_equity = 0.0
+        self.max_drawdown = 0.0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+        self.total_duration = 0.0
+        self.mean_return = 0.0
+        self.m2_return = 0.0  # Sum of squared deviations from the mean (Welford)
+        self.downside_sq = 0.0  # Sum of squared negative returns
+
+    @classmethod
+    def from_arrays(cls, profit_loss, returns, durations):
+        """
+        Build the same state from full histories in one vectorized pass.
+        """
+        stats = cls()
+        n = len(profit_loss)
+        if n == 0:
+            return stats
+        equity = np.cumsum(profit_loss)
+        peaks = np.maximum.accumulate(np.concatenate(([0.0], equity)))[1:]
+        stats.trade_count = n
+        stats.win_count = int(np.count_nonzero(profit_loss > 0))
+        stats.equity = float(equity[-1])
+        stats.peak_equity = float(peaks[-1])
+        stats.max_drawdown = float(np.max(peaks - equity))
+        stats.gross_profit = float(profit_loss[profit_loss > 0].sum())
+        stats.gross_loss = float(-profit_loss[profit_loss < 0].sum())
+        stats.total_duration = float(np.nansum(durations))
+        stats.mean_return = float(returns.mean())
+        stats.m2_return = float(((returns - returns.mean()) ** 2).sum())
+        stats.downside_sq = float((np.minimum(returns, 0.0) ** 2).sum())
+        return stats
+
+    def update(self, profit_loss, pct_change, duration):
+        self.trade_count += 1
+        if profit_loss > 0:
+            self.win_count += 1
+            self.gross_profit += profit_loss
+        elif profit_loss < 0:
+            self.gross_loss -= profit_loss
+        self.equity += profit_loss
+        if self.equity > self.peak_equity:
+            self.peak_equity = self.equity
+        self.max_drawdown = max(self.max_drawdown, self.peak_equity - self.equity)
+        self.total_duration += duration or 0.0
+
+        delta = pct_change - self.mean_return
+        self.mean_return += delta / self.trade_count
+        self.m2_return += delta * (pct_change - self.mean_return)
+        if pct_change < 0:
+            self.downside_sq += pct_change * pct_change
+
+    def as_dict(self):
+        n = self.trade_count
+        std = math.sqrt(self.m2_return / (n - 1)) if n > 1 else 0.0
+        downside = math.sqrt(self.downside_sq / n) if n else 0.0
+        return {
+            'trade_count': n,
+            'win_rate': self.win_count / n if n else None,
+            'equity': self.equity,
+            'max_drawdown': self.max_drawdown,
+            'current_drawdown': self.peak_equity - self.equity,
+            'sharpe': self.mean_return / std if std else None,
+            'sortino': self.mean_return / downside if downside else None,
+            'avg_trade_duration': self.total_duration / n if n else None,
+            'profit_factor': self.gross_profit / self.gross_loss if self.gross_loss else None,
+        }
+
+def compute_metrics(pairs, profit_loss, returns, durations):
+    """
+    Batch mode: metrics over a full trade history, overall and per pair, with NumPy.
+    Returns {'overall': {...}, 'pairs': {pair: {...}}}.
+    """
+    pairs = np.asarray(pairs)
+    profit_loss = np.asarray(profit_loss, dtype=np.float64)
+    returns = np.asarray(returns, dtype=np.float64)
+    durations = np.asarray(durations, dtype=np.float64)
+    result = {'overall': RiskStats.from_arrays(profit_loss, returns, durations).as_dict(), 'pairs': {}}
+    for pair in np.unique(pairs):
+        mask = pairs == pair
+        result['pairs'][str(pair)] = RiskStats.from_arrays(profit_loss[mask], returns[mask], durations[mask]).as_dict()
+    return result
+
+class RiskAnalytics:
+    """
+    Keeps all-time and rolling risk metrics for every recorded trade, overall and per pair.
+
+    The trading runtime feeds it each trade as it closes; a separate process such as the
+    dashboard calls `sync` to pull only the rows written since its last call.
+    """
+
+    def __init__(self, window=100):
+        self.window = window
+        self.overall = RiskStats()
+        self.pairs = {}
+        self.recent = deque(maxlen=window)  # (pair, profit_loss, pct_change, duration) of the latest trades
+        self.last_id = 0
+        self._lock = threading.Lock()
+
+    def update(self, pair, profit_loss, pct_change, duration, trade_id=None):
+        """
+        Apply one closed trade. Returns False, changing nothing, for a trade id that was already applied.
+        """
+        with self._lock:
+            if trade_id is not None and trade_id <= self.last_id:
+                return False
+            self.overall.update(profit_loss, pct_change, duration)
+            pair_stats = self.pairs.get(pair)
+            if pair_stats is None:
+                pair_stats = self.pairs[pair] = RiskStats()
+            pair_stats.update(profit_loss, pct_change, duration)
+            self.recent.append((pair, profit_loss, pct_change, duration))
+            if trade_id is not None:
+                self.last_id = trade_id
+            return True
+
+    def rebuild(self, engine):
+        """
+        Recompute everything from the full bot_performance history in one vectorized pass.
+        """
+        query = text("SELECT id, pair, profit_loss, pct_change, trade_duration FROM bot_performance ORDER BY id;")
+        with engine.connect() as conn:
+            rows = conn.execute(query).fetchall()
+        ids = np.array([row.id for row in rows], dtype=np.int64)
+        pairs = np.array([row.pair for row in rows], dtype=object)
+        profit_loss = np.array([row.profit_loss for row in rows], dtype=np.float64)
+        returns = np.array([row.pct_change for row in rows], dtype=np.float64)
+        durations = np.array([row.trade_duration if row.trade_duration is not None else np.nan for row in rows], dtype=np.float64)
+
+        overall = RiskStats.from_arrays(profit_loss, returns, durations)
+        per_pair = {}
+        for pair in np.unique(pairs) if len(pairs) else []:
+            mask = pairs == pair
+            per_pair[pair] = RiskStats.from_arrays(profit_loss[mask], returns[mask], durations[mask])
+        recent = deque(zip(pairs[-self.window:], profit_loss[-self.window:], returns[-self.window:], durations[-self.window:]), maxlen=self.window)
+
+        with self._lock:
+            self.overall = overall
+            self.pairs = per_pair
+            self.recent = recent
+            self.last_id = int(ids[-1]) if len(ids) else 0
+
+    def sync(self, engine):
+        """
+        Apply rows added to bot_performance since the last rebuild or sync; an index-backed primary key lookup.
+        """
+        query = text("SELECT id, pair, profit_loss, pct_change, trade_duration FROM bot_performance WHERE id > :last_id ORDER BY id;")
+        with engine.connect() as conn:
+            rows = conn.execute(query, {"last_id": self.last_id}).fetchall()
+        for row in rows:
+            self.update(row.pair, row.profit_loss, row.pct_change, row.trade_duration, row.id)
+        return len(rows)
+
+    def rolling(self):
+        """
+        Metrics over the last `window` trades, overall and per pair.
+        """
+        with self._lock:
+            recent = list(self.recent)
+        if not recent:
+            return {'overall': RiskStats().as_dict(), 'pairs': {}}
+        pairs, profit_loss, returns, durations = zip(*recent)
+        durations = [d if d is not None else np.nan for d in durations]
+        return compute_metrics(pairs, profit_loss, returns, durations)
+
+    def snapshot(self):
+        """
+        All-time metrics overall and per pair, plus the rolling-window metrics.
+        """
+        with self._lock:
+            result = {
+                'overall': self.overall.as_dict(),
+                'pairs': {pair: stats.as_dict() for pair, stats in self.pairs.items()},
+            }
+        result['rolling'] = self.rolling()
+        return result
+
+risk_analytics = RiskAnalytics()
@@ -1,16 +1,26 @@
-import os
 from flask import Flask
-from sqlalchemy import create_engine
+from storage import engine, database_writer
+from analytics import RiskAnalytics
+from performance import create_performance_table
+from bar_store import create_bars_table
+from .feed import TradeFeed
 
 def create_app():
     app = Flask(__name__)
 
-    # Create DB engine; adjust relative path to your DB if needed
-    basedir = os.path.abspath(os.path.dirname(__file__))
-    db_path = os.path.join(basedir, '..', 'TradingData.db')
-    engine = create_engine(f'sqlite:///{db_path}')
+    # Share the configured engine and write-behind writer from storage.py with the trading runtime's code
+    database_writer.start()
+    create_performance_table(engine)
+    create_bars_table(engine)
+
+    # Build the risk metrics once; the trade feed then applies only trades added since
+    analytics = RiskAnalytics()
+    analytics.rebuild(engine)
+    feed = TradeFeed(engine, analytics)
+    feed.start()
+
     # Import routes and initialize with app and engine
     from . import routes
-    routes.init_app(app, engine)
+    routes.init_app(app, engine, database_writer, analytics, feed)
 
     return app
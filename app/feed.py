@@ -0,0 +1,110 @@
+import json
+import queue
+import threading
+import time
+from sqlalchemy import text
+
+class TradeFeed:
+    """
+    Watches bot_performance for new trades on one background thread and fans them out.
+
+    Every new trade bumps `version`, clears the response cache, updates the risk analytics
+    and is pushed to each Server-Sent Events subscriber, so dashboard clients neither poll
+    the database themselves nor get served stale cached pages.
+    """
+
+    def __init__(self, engine, analytics, poll_interval=1.0):
+        self.engine = engine
+        self.analytics = analytics
+        self.poll_interval = poll_interval
+        self.version = analytics.last_id  # Highest trade id seen so far
+        self._cache = {}
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()  # check() runs on the poll thread and from request handlers
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trade-feed", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Error checking for new trades: {e}")
+            time.sleep(self.poll_interval)
+
+    def check(self):
+        """
+        Pick up trades written since the last check; a primary-key range scan that is empty most of the time.
+        Serialized, so overlapping calls never apply or publish the same trade twice.
+        """
+        query = text("SELECT * FROM bot_performance WHERE id > :last_id ORDER BY id;")
+        with self._check_lock:
+            with self.engine.connect() as conn:
+                rows = [dict(row._mapping) for row in conn.execute(query, {"last_id": self.version})]
+            if not rows:
+                return
+            applied = [row for row in rows if self.analytics.update(row['pair'], row['profit_loss'], row['pct_change'], row['trade_duration'], row['id'])]
+            with self._lock:
+                self.version = rows[-1]['id']
+                self._cache.clear()
+            if not applied:
+                return
+            for row in applied:
+                self.publish('trade', row)
+            self.publish('stats', self.analytics.snapshot())
+
+    def cached(self, key, loader):
+        """
+        Return the cached value for `key`, computing it with `loader()` on a miss.
+        Entries live until the next trade is written.
+        """
+        with self._lock:
+            version = self.version
+            if key in self._cache:
+                return self._cache[key]
+        value = loader()
+        with self._lock:
+            if self.version == version:
+                self._cache[key] = value
+        return value
+
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=1000)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event, data):
+        message = f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                pass  # A stalled client misses events rather than holding up the others
+
+    def stream(self, keepalive=15):
+        """
+        Generator of Server-Sent Events for one client.
+        """
+        subscriber = self.subscribe()
+        try:
+            yield f"event: stats\ndata: {json.dumps(self.analytics.snapshot(), default=str)}\n\n"
+            while True:
+                try:
+                    yield subscriber.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+        finally:
+            self.unsubscribe(subscriber)
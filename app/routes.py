@@ -1,22 +1,148 @@
-from flask import render_template, request, redirect, url_for, jsonify
+import json
+import zlib
+from flask import render_template, request, redirect, url_for, jsonify, stream_with_context
 from sqlalchemy import text
-from datetime import datetime
+from datetime import datetime, timedelta
+import numpy as np
+import downsample
+from bar_store import BAR_INTERVAL
+import metrics
+from .cache import TTLCache
 
-def init_app(app, engine):
+def init_app(app, engine, database_writer, analytics, feed):
+    price_cache = TTLCache()
+
+    def fetch_performance(since_id=None, before_id=None, limit=50):
+        """
+        Keyset pagination over the primary key: rows newer than `since_id` (oldest first),
+        rows older than `before_id` (newest first), or the latest `limit` rows.
+        """
+        if since_id is not None:
+            query = text("SELECT * FROM bot_performance WHERE id > :since_id ORDER BY id ASC LIMIT :limit")
+        elif before_id is not None:
+            query = text("SELECT * FROM bot_performance WHERE id < :before_id ORDER BY id DESC LIMIT :limit")
+        else:
+            query = text("SELECT * FROM bot_performance ORDER BY id DESC LIMIT :limit")
+        with engine.connect() as conn:
+            result = conn.execute(query, {"since_id": since_id, "before_id": before_id, "limit": limit})
+            return [dict(row._mapping) for row in result]
+
+    def cached_json(key, loader):
+        """
+        Serve a JSON body from the feed's cache with an ETag tied to the latest trade id,
+        answering 304 when the client already has it.
+        """
+        etag = f"{feed.version}-{zlib.crc32(repr(key).encode()):x}"
+        if etag in request.if_none_match:
+            response = app.response_class(status=304)
+        else:
+            body = feed.cached(key, lambda: json.dumps(loader(), default=str))
+            response = app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
 
     @app.route('/')
     def index():
-        with engine.connect() as conn:
-            result = conn.execute(text("SELECT * FROM bot_performance ORDER BY timestamp DESC LIMIT 50"))
-            performances = result.fetchall()
+        performances = feed.cached(('index',), fetch_performance)
         return render_template('index.html', performances=performances)
 
     @app.route('/api/performance')
     def api_performance():
+        since_id = request.args.get('since_id', type=int)
+        before_id = request.args.get('before_id', type=int)
+        limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+        key = ('performance', since_id, before_id, limit)
+        return cached_json(key, lambda: fetch_performance(since_id, before_id, limit))
+
+    @app.route('/api/stats')
+    def api_stats():
+        return cached_json(('stats',), analytics.snapshot)
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        # This process's own metrics (database writer, requests); the trading runtime serves its own on METRICS_PORT
+        return app.response_class(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+    @app.route('/api/stream')
+    def api_stream():
+        """
+        Server-Sent Events: a 'stats' event on connect, then 'trade' and 'stats' events as trades are written.
+        """
+        return app.response_class(
+            stream_with_context(feed.stream()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+    def parse_time(value, default):
+        """
+        Accept epoch milliseconds or an ISO timestamp; the bars table stores local wall-clock times,
+        so timestamps with a UTC offset are converted to naive local time.
+        """
+        if value is None:
+            return default
+        if value.isdigit():
+            return datetime.fromtimestamp(int(value) / 1000)
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone().replace(tzinfo=None)
+        return parsed
+
+    def load_prices(pair, timeframe, start, end):
+        """
+        Range read answered from the bars table's covering (pair, timeframe, timestamp, close) index.
+        """
+        query = text("""
+        SELECT timestamp, close FROM bars
+        WHERE pair = :pair AND timeframe = :timeframe AND timestamp BETWEEN :start AND :end
+        ORDER BY timestamp
+        """)
         with engine.connect() as conn:
-            result = conn.execute(text("SELECT * FROM bot_performance ORDER BY timestamp DESC LIMIT 50"))
-            rows = [dict(row._mapping) for row in result]
-        return jsonify(rows)
+            rows = conn.execute(query, {"pair": pair, "timeframe": timeframe, "start": start, "end": end}).fetchall()
+        timestamps = np.array([str(row[0]) for row in rows], dtype='datetime64[ms]')
+        closes = np.array([row[1] for row in rows], dtype=np.float64)
+        return timestamps, closes
+
+    @app.route('/api/prices/<pair>')
+    def api_prices(pair):
+        """
+        Close prices for a pair over [start, end], downsampled on the server to at most `points` points.
+        Reads bars of `timeframe` seconds from the bars table, the close-price bars the strategies trade on by default.
+        """
+        pair = pair.upper()
+        if not pair.isalnum():
+            return jsonify({'error': 'Invalid pair.'}), 400
+        # Round the default range end so repeated requests for "latest" share a cache entry
+        now = datetime.now().replace(microsecond=0)
+        now -= timedelta(seconds=now.second % 5)
+        try:
+            end = parse_time(request.args.get('end'), now)
+            start = parse_time(request.args.get('start'), end - timedelta(hours=24))
+        except ValueError:
+            return jsonify({'error': 'start and end must be epoch milliseconds or ISO timestamps.'}), 400
+        timeframe = request.args.get('timeframe', BAR_INTERVAL, type=int)
+        points = max(3, min(request.args.get('points', 500, type=int), 5000))
+        method = request.args.get('method', 'lttb')
+        if method not in downsample.METHODS:
+            return jsonify({'error': f"method must be one of {sorted(downsample.METHODS)}."}), 400
+
+        def load():
+            timestamps, closes = load_prices(pair, timeframe, start, end)
+            idx = downsample.METHODS[method](timestamps.astype(np.int64), closes, points)
+            return json.dumps({
+                'pair': pair,
+                'timeframe': timeframe,
+                'count': int(len(closes)),
+                'timestamps': timestamps[idx].astype(str).tolist(),
+                'close': closes[idx].tolist(),
+            })
+
+        # Ranges that ended in the past do not change, so they can be cached for longer
+        ttl = 300 if end < now - timedelta(minutes=5) else 5
+        key = (pair, timeframe, start, end, points, method)
+        body = price_cache.get_or_load(key, load, ttl)
+        return app.response_class(body, mimetype='application/json')
 
     @app.route('/add', methods=['GET', 'POST'])
     def add_performance():
@@ -37,28 +163,29 @@ def init_app(app, engine):
             total_money_invested = float(request.form.get('total_money_invested', 0))
             total_profit = float(request.form.get('total_profit', 0))
 
-            with engine.connect() as conn:
-                query = text("""
-                    INSERT INTO bot_performance 
-                    (timestamp, pair, entry_price, exit_price, profit_loss, total_profit_loss, trade_count, win_count, loss_count, pct_change, trade_duration, commission_rate, total_money_invested, total_profit)
-                    VALUES (:timestamp, :pair, :entry_price, :exit_price, :profit_loss, :total_profit_loss, :trade_count, :win_count, :loss_count, :pct_change, :trade_duration, :commission_rate, :total_money_invested, :total_profit)
-                """)
-                conn.execute(query, {
-                    'timestamp': timestamp,
-                    'pair': pair,
-                    'entry_price': entry_price,
-                    'exit_price': exit_price,
-                    'profit_loss': profit_loss,
-                    'total_profit_loss': total_profit_loss,
-                    'trade_count': trade_count,
-                    'win_count': win_count,
-                    'loss_count': loss_count,
-                    'pct_change': pct_change,
-                    'trade_duration': trade_duration,
-                    'commission_rate': commission_rate,
-                    'total_money_invested': total_money_invested,
-                    'total_profit': total_profit
-                })
+            query = text("""
+                INSERT INTO bot_performance 
+                (timestamp, pair, entry_price, exit_price, profit_loss, total_profit_loss, trade_count, win_count, loss_count, pct_change, trade_duration, commission_rate, total_money_invested, total_profit)
+                VALUES (:timestamp, :pair, :entry_price, :exit_price, :profit_loss, :total_profit_loss, :trade_count, :win_count, :loss_count, :pct_change, :trade_duration, :commission_rate, :total_money_invested, :total_profit)
+            """)
+            # Wait for the writer so errors surface on this request
+            database_writer.execute(query, {
+                'timestamp': timestamp,
+                'pair': pair,
+                'entry_price': entry_price,
+                'exit_price': exit_price,
+                'profit_loss': profit_loss,
+                'total_profit_loss': total_profit_loss,
+                'trade_count': trade_count,
+                'win_count': win_count,
+                'loss_count': loss_count,
+                'pct_change': pct_change,
+                'trade_duration': trade_duration,
+                'commission_rate': commission_rate,
+                'total_money_invested': total_money_invested,
+                'total_profit': total_profit
+            }).result()
+            feed.check()  # Invalidate cached responses and notify stream clients right away
 
             return redirect(url_for('index'))
 
@@ -0,0 +1,149 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
+from binance.client import Client
+from price_buffer import get_buffer
+from tick_archive import tick_archive
+from replay_server import load_recording
+from storage import engine
+from data_request import persistence_sink
+from bar_store import create_bars_table
+from order_gateway import RateLimiter
+
+# Kline intervals Binance serves, in seconds; bars are rebuilt from the largest one that divides the bar interval
+KLINE_INTERVALS = (('1h', 3600), ('30m', 1800), ('15m', 900), ('5m', 300), ('3m', 180), ('1m', 60), ('1s', 1))
+KLINE_LIMIT = 1000  # Maximum klines per request
+KLINE_WEIGHT = 2  # Request weight of one klines call
+BACKFILL_WORKERS = 8  # Pairs backfilled concurrently
+
+# Kline requests share the exchange's per-minute weight budget with everything else on this IP
+rate_limiter = RateLimiter()
+
+_client = None
+
+def get_client():
+    """
+    Public market-data client; klines need no API key and no ping at startup.
+    """
+    global _client
+    if _client is None:
+        _client = Client(ping=False)
+    return _client
+
+def bucket_closes(times, prices, interval_ms):
+    """
+    Turn time-ordered (ms) observations into (bucket, close) bars: the last price seen in each interval.
+    Intervals without any observation produce no bar, as in live ingestion.
+    """
+    times = np.asarray(times, dtype=np.int64)
+    prices = np.asarray(prices, dtype=np.float64)
+    if len(times) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    buckets = times // interval_ms
+    last = np.append(np.flatnonzero(np.diff(buckets)), len(buckets) - 1)
+    return buckets[last], prices[last]
+
+def from_archive(pair, num_bars, interval_ms, end_bucket):
+    """
+    Bars for the window before `end_bucket` rebuilt from the local tick archive.
+    Only used when the archive has a tick in every bar of the window, from its start to its end
+    with no gap, e.g. not after a short previous run or an outage; otherwise returns None.
+    """
+    start_ms = (end_bucket - num_bars) * interval_ms
+    ticks = tick_archive.read_range(pair, start_ms, end_bucket * interval_ms - 1)
+    buckets, closes = bucket_closes(ticks['time'], ticks['price'], interval_ms)
+    # Buckets are distinct and inside the window, so num_bars of them means every bar is present
+    if len(buckets) != num_bars:
+        return None
+    return buckets, closes
+
+def from_klines(pair, num_bars, interval_ms, end_bucket, client=None):
+    """
+    Bars for the window before `end_bucket` rebuilt from historical klines, paging through the window.
+    Every request goes through the shared rate limiter.
+    """
+    client = client or get_client()
+    interval_seconds = interval_ms // 1000
+    name, kline_seconds = next((name, seconds) for name, seconds in KLINE_INTERVALS if interval_seconds % seconds == 0)
+    start_ms = (end_bucket - num_bars) * interval_ms
+    end_ms = end_bucket * interval_ms - 1
+
+    times, closes = [], []
+    while start_ms <= end_ms:
+        rate_limiter.acquire(KLINE_WEIGHT)
+        klines = client.get_klines(symbol=pair.upper(), interval=name, startTime=start_ms, endTime=end_ms, limit=KLINE_LIMIT)
+        response = getattr(client, 'response', None)
+        used_weight = response.headers.get('x-mbx-used-weight-1m') if response is not None else None
+        if used_weight is not None:
+            rate_limiter.update(int(used_weight))
+        if not klines:
+            break
+        times.extend(kline[0] for kline in klines)
+        closes.extend(float(kline[4]) for kline in klines)
+        start_ms = klines[-1][0] + kline_seconds * 1000
+    return bucket_closes(times, closes, interval_ms)
+
+def from_fixture(pair, num_bars, interval_ms, path):
+    """
+    The last `num_bars` bars of a pair rebuilt from a recorded ticker file (see replay_server.record).
+    """
+    messages = [m for m in load_recording(path) if m.get('s', '').upper() == pair.upper()]
+    buckets, closes = bucket_closes([m['E'] for m in messages], [float(m['c']) for m in messages], interval_ms)
+    return buckets[-num_bars:], closes[-num_bars:]
+
+def load_history(pair, num_bars=200, time_interval=20, fixture=None, client=None):
+    """
+    Return (timestamps, closes) for up to `num_bars` complete bars ending before the current one.
+
+    Sources are tried in order: the local tick archive, exchange klines, then a recorded fixture.
+    Timestamps are local bar start times, matching what the bar builder writes.
+    """
+    interval_ms = time_interval * 1000
+    end_bucket = int(time.time() * 1000) // interval_ms  # The open bar is left to live ingestion
+
+    bars = from_archive(pair, num_bars, interval_ms, end_bucket)
+    source = 'tick archive'
+    if bars is None:
+        try:
+            bars = from_klines(pair, num_bars, interval_ms, end_bucket, client)
+            source = 'klines'
+        except Exception as e:
+            print(f"Error fetching klines for {pair}: {e}")
+            if fixture is None:
+                return [], []
+            bars = from_fixture(pair, num_bars, interval_ms, fixture)
+            source = fixture
+
+    buckets, closes = bars
+    timestamps = [datetime.fromtimestamp(bucket * interval_ms / 1000) for bucket in buckets[-num_bars:]]
+    print(f"Backfilled {len(timestamps)} bars for {pair} from {source}")
+    return timestamps, closes[-num_bars:]
+
+def backfill_pair(pair, buffer_size=200, time_interval=20, fixture=None, client=None):
+    """
+    Load history into the pair's price buffer in one batch and persist it with one executemany.
+    Skipped when the buffer already holds bars.
+    """
+    price_buffer = get_buffer(pair, buffer_size)
+    if price_buffer.seq:
+        return 0
+    timestamps, closes = load_history(pair, buffer_size, time_interval, fixture, client)
+    if not timestamps:
+        return 0
+    price_buffer.extend(timestamps, closes)
+    persistence_sink.submit_many(pair, time_interval, list(zip(timestamps, closes.tolist())))
+    return len(timestamps)
+
+def warm_start(pairs, buffer_size=200, time_interval=20, fixture=None):
+    """
+    Backfill up to BACKFILL_WORKERS pairs concurrently before ingestion and trading start.
+    BACKFILL_FIXTURE names a recorded ticker file to fall back on when the exchange is unreachable.
+    """
+    fixture = fixture or os.getenv('BACKFILL_FIXTURE')
+    create_bars_table(engine)
+    persistence_sink.start()
+    with ThreadPoolExecutor(max_workers=max(min(len(pairs), BACKFILL_WORKERS), 1)) as pool:
+        counts = pool.map(lambda pair: backfill_pair(pair, buffer_size, time_interval, fixture), pairs)
+        return dict(zip(pairs, counts))
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import argparse
+import math
+import numpy as np
+import pandas as pd
+import sqlalchemy
+from sqlalchemy import text
+from performance import COMMISSION_RATE, trade_profit_loss
+from bar_store import BAR_INTERVAL
+
+def load_prices(source, pair='BTCUSDT', timeframe=BAR_INTERVAL):
+    """
+    Load a historical close-price series as (timestamps, closes) NumPy arrays, oldest first.
+
+    Parameters:
+    source (str): A .csv or .parquet file with 'timestamp' and 'close' columns, or a SQLAlchemy database URL.
+    pair (str): Trading pair to read when `source` is a database.
+    timeframe (int): Timeframe (seconds) of the bars to read from the bars table; the live close-price bars by default.
+    """
+    if source.endswith('.csv'):
+        df = pd.read_csv(source, parse_dates=['timestamp'])
+    elif source.endswith('.parquet'):
+        df = pd.read_parquet(source, columns=['timestamp', 'close'])
+    else:
+        engine = sqlalchemy.create_engine(source)
+        query = text("SELECT timestamp, close FROM bars WHERE pair = :pair AND timeframe = :timeframe ORDER BY timestamp;")
+        params = {"pair": pair.upper(), "timeframe": timeframe}
+        with engine.connect() as conn:
+            df = pd.read_sql(query, conn, params=params, parse_dates=['timestamp'])
+    df = df.dropna(subset=['close']).sort_values('timestamp')
+    return df['timestamp'].to_numpy(dtype='datetime64[ms]'), df['close'].to_numpy(dtype=np.float64)
+
+def moving_average(closes, window):
+    """
+    Simple moving average over the whole series in one cumulative-sum pass; NaN until `window` bars exist.
+    """
+    ma = np.full(len(closes), np.nan)
+    if len(closes) >= window:
+        csum = np.cumsum(np.insert(closes, 0, 0.0))
+        ma[window - 1:] = (csum[window:] - csum[:-window]) / window
+    return ma
+
+def crossover_signals(closes, short_window=9, long_windows=(20, 50, 100)):
+    """
+    Boolean array marking the bars where the short MA crosses above any of the long MAs,
+    matching strategies.check_for_buy_signal evaluated on every bar.
+    """
+    signals = np.zeros(len(closes), dtype=bool)
+    short_ma = moving_average(closes, short_window)
+    for window in long_windows:
+        long_ma = moving_average(closes, window)
+        # Comparisons against NaN are False, just like the live check during warm-up
+        with np.errstate(invalid='ignore'):
+            signals[1:] |= (short_ma[:-1] < long_ma[:-1]) & (short_ma[1:] > long_ma[1:])
+    return signals
+
+def find_exit(closes, entry_idx, take_profit=0.01, trailing_stop=0.013, chunk=256):
+    """
+    Return the index of the first bar after `entry_idx` where strategies.check_for_sell_signal would fire,
+    or None if the position is still open at the end of the series.
+
+    The bars are scanned in growing chunks, each checked with vectorized running-max arithmetic.
+    """
+    entry_price = closes[entry_idx]
+    target = entry_price * (1 + take_profit)
+    highest = entry_price
+    start = entry_idx + 1
+    while start < len(closes):
+        segment = closes[start:start + chunk]
+        running_high = np.maximum(np.maximum.accumulate(segment), highest)
+        hits = (segment >= target) | (segment <= running_high * (1 - trailing_stop))
+        if hits.any():
+            return start + int(np.argmax(hits))
+        highest = running_high[-1]
+        start += len(segment)
+        chunk *= 2
+    return None
+
+def trade_quantity(prices, notional=50, step_size=None, min_quantity=None):
+    """
+    Quantity bought for a given notional, rounded down to the lot step like execution.get_trade_quantity.
+    """
+    quantity = notional / prices
+    if step_size:
+        step_precision = abs(int(round(math.log10(step_size))))
+        quantity = np.round(np.floor(quantity / step_size) * step_size, step_precision)
+    if min_quantity:
+        quantity = np.maximum(quantity, min_quantity)
+    return quantity
+
+def simulate_trades(closes, signals, take_profit=0.01, trailing_stop=0.013):
+    """
+    Walk the entry signals, skipping those that fire while a position is open.
+    Returns arrays of entry and exit bar indices.
+    """
+    signal_idx = np.flatnonzero(signals)
+    entries = []
+    exits = []
+    next_allowed = 0
+    while True:
+        k = np.searchsorted(signal_idx, next_allowed)
+        if k == len(signal_idx):
+            break
+        entry = signal_idx[k]
+        exit_idx = find_exit(closes, entry, take_profit, trailing_stop)
+        if exit_idx is None:
+            break
+        entries.append(entry)
+        exits.append(exit_idx)
+        # The live loop only looks for a new entry on the bar after the sell
+        next_allowed = exit_idx + 1
+    return np.array(entries, dtype=np.int64), np.array(exits, dtype=np.int64)
+
+def performance_records(pair, timestamps, closes, entries, exits, quantities, commission_rate=COMMISSION_RATE):
+    """
+    Build the rows performance.insert_trade_performance would have written for these trades.
+    """
+    entry_prices = closes[entries]
+    exit_prices = closes[exits]
+    profit_loss = trade_profit_loss(entry_prices, exit_prices, quantities, commission_rate)
+    trade_count = np.arange(1, len(entries) + 1)
+    win_count = np.cumsum(profit_loss > 0)
+    total_profit = np.cumsum(profit_loss)
+    total_money_invested = np.cumsum(entry_prices * quantities)
+    exit_times = timestamps[exits].astype('datetime64[m]')  # The live record truncates the exit time to the minute
+    trade_duration = (exit_times - timestamps[entries]).astype('timedelta64[ms]').astype(np.float64) / 60000
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cumulative_pct_change = total_profit / total_money_invested * 100
+
+    return pd.DataFrame({
+        'timestamp': timestamps[exits],
+        'pair': pair,
+        'entry_price': entry_prices,
+        'exit_price': exit_prices,
+        'profit_loss': profit_loss,
+        'total_profit_loss': total_profit,
+        'trade_count': trade_count,
+        'win_count': win_count,
+        'loss_count': trade_count - win_count,
+        'pct_change': (exit_prices - entry_prices) / entry_prices * 100,
+        'cumulative_pct_change': cumulative_pct_change,
+        'trade_duration': trade_duration,
+        'commission_rate': commission_rate,
+        'total_money_invested': total_money_invested,
+        'total_profit': total_profit,
+    })
+
+def run_backtest(timestamps, closes, pair='BTCUSDT', short_window=9, long_windows=(20, 50, 100),
+                 take_profit=0.01, trailing_stop=0.013, notional=50, step_size=None, min_quantity=None,
+                 commission_rate=COMMISSION_RATE):
+    """
+    Backtest the MA-crossover strategy with its take-profit and trailing-stop exits over a price series.
+
+    Returns a DataFrame of trade records with the same columns as the bot_performance table.
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    signals = crossover_signals(closes, short_window, long_windows)
+    entries, exits = simulate_trades(closes, signals, take_profit, trailing_stop)
+    quantities = trade_quantity(closes[entries], notional, step_size, min_quantity)
+    return performance_records(pair, np.asarray(timestamps, dtype='datetime64[ms]'), closes, entries, exits, quantities, commission_rate)
+
+def summarize(records):
+    """
+    Headline statistics for a set of backtest trade records.
+    """
+    if records.empty:
+        return {'trades': 0, 'total_profit': 0.0, 'win_rate': None}
+    last = records.iloc[-1]
+    return {
+        'trades': int(last['trade_count']),
+        'total_profit': float(last['total_profit']),
+        'win_rate': float(last['win_count'] / last['trade_count']),
+        'cumulative_pct_change': float(last['cumulative_pct_change']),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest the MA-crossover strategy on historical prices.")
+    parser.add_argument('source', help="CSV/Parquet file or database URL")
+    parser.add_argument('--pair', default='BTCUSDT')
+    parser.add_argument('--timeframe', type=int, default=BAR_INTERVAL, help="Timeframe (seconds) of the bars to read from the bars table")
+    parser.add_argument('--output', default=None, help="Write the trade records to this CSV file")
+    args = parser.parse_args()
+
+    timestamps, closes = load_prices(args.source, args.pair, args.timeframe)
+    records = run_backtest(timestamps, closes, args.pair)
+    print(summarize(records))
+    if args.output:
+        records.to_csv(args.output, index=False)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import argparse
+import numpy as np
+import pandas as pd
+import sqlalchemy
+from sqlalchemy import text, inspect
+
+# Timeframe (seconds) of the close-price bars the ingest publishes to the price buffers
+BAR_INTERVAL = 20
+
+BAR_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+# SQLite allows at most 500 terms in one compound SELECT
+MAX_PAIRS_PER_QUERY = 400
+
+def create_bars_table(engine):
+    """
+    Create the one table every pair's bars and candles are stored in, keyed by (pair, timeframe, timestamp),
+    with covering indexes for close-price reads per pair and across pairs at the same time.
+    """
+    with engine.connect() as conn:
+        conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS bars (
+            pair TEXT NOT NULL,
+            timeframe INTEGER NOT NULL,
+            timestamp DATETIME NOT NULL,
+            open REAL,
+            high REAL,
+            low REAL,
+            close REAL,
+            volume REAL,
+            PRIMARY KEY (pair, timeframe, timestamp)
+        );
+        """))
+        # Recent closes of one pair, and ranges for charts and backtests, are answered from the index alone
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_bars_pair_close ON bars (pair, timeframe, timestamp, close);"))
+        # Every pair's close over a time range, for cross-pair work
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_bars_time_close ON bars (timeframe, timestamp, pair, close);"))
+        conn.commit()
+
+# A close-price bar only sets the close, so it never wipes the OHLCV of a candle stored under the same key
+upsert_close_query = text("""
+INSERT INTO bars (pair, timeframe, timestamp, close)
+VALUES (:pair, :timeframe, :timestamp, :close)
+ON CONFLICT (pair, timeframe, timestamp) DO UPDATE SET close = excluded.close;
+""")
+
+upsert_candle_query = text("""
+INSERT INTO bars (pair, timeframe, timestamp, open, high, low, close, volume)
+VALUES (:pair, :timeframe, :timestamp, :open, :high, :low, :close, :volume)
+ON CONFLICT (pair, timeframe, timestamp) DO UPDATE SET
+    open = excluded.open, high = excluded.high, low = excluded.low, close = excluded.close, volume = excluded.volume;
+""")
+
+def close_rows(pair, timeframe, bars):
+    """
+    Parameters for upsert_close_query from (timestamp, close) bars.
+    """
+    return [{"pair": pair.upper(), "timeframe": timeframe, "timestamp": timestamp, "close": close} for timestamp, close in bars]
+
+def recent_bars_query(num_pairs, columns=('close',)):
+    """
+    One query returning the latest :num_bars bars of each of :pair_0 .. :pair_<n-1>.
+    Each pair is its own index-backed LIMIT branch of a UNION ALL, so the cost grows with the rows returned,
+    not with the history stored.
+    """
+    selected = ', '.join(('pair', 'timestamp') + tuple(columns))
+    branches = [
+        f"SELECT * FROM (SELECT {selected} FROM bars WHERE pair = :pair_{i} AND timeframe = :timeframe "
+        f"ORDER BY timestamp DESC LIMIT :num_bars) AS b{i}"
+        for i in range(num_pairs)
+    ]
+    return text('\nUNION ALL\n'.join(branches))
+
+def load_recent_bars(engine, pairs, timeframe=BAR_INTERVAL, num_bars=100, columns=('close',)):
+    """
+    Load the last `num_bars` bars of many pairs in one query (one per MAX_PAIRS_PER_QUERY pairs).
+
+    Returns a long DataFrame with 'pair', 'timestamp' and the requested columns, sorted by pair
+    and then time, oldest first. Pairs without bars are absent.
+    """
+    columns = tuple(columns)
+    unknown = set(columns) - set(BAR_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown bar columns: {sorted(unknown)}")
+    pairs = [pair.upper() for pair in pairs]
+    frames = []
+    with engine.connect() as conn:
+        for start in range(0, len(pairs), MAX_PAIRS_PER_QUERY):
+            chunk = pairs[start:start + MAX_PAIRS_PER_QUERY]
+            params = {f"pair_{i}": pair for i, pair in enumerate(chunk)}
+            params.update(timeframe=timeframe, num_bars=num_bars)
+            frames.append(pd.read_sql(recent_bars_query(len(chunk), columns), conn, params=params))
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=('pair', 'timestamp') + columns)
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    return df.sort_values(['pair', 'timestamp'], kind='stable').reset_index(drop=True)
+
+def recent_closes(engine, pair, timeframe=BAR_INTERVAL, num_bars=100):
+    """
+    The last `num_bars` closes of one pair as (timestamps, closes) NumPy arrays, oldest first.
+    """
+    df = load_recent_bars(engine, [pair], timeframe, num_bars)
+    return df['timestamp'].to_numpy(dtype='datetime64[ms]'), df['close'].to_numpy(dtype=np.float64)
+
+def pivot_closes(bars):
+    """
+    Align the closes of a load_recent_bars result by time: one row per timestamp, one column per pair,
+    NaN where a pair has no bar. Suited to correlations and other cross-pair statistics.
+    """
+    return bars.pivot(index='timestamp', columns='pair', values='close')
+
+def to_matrix(bars, pairs, num_bars, column='close'):
+    """
+    Stack a load_recent_bars result into (timestamps, values) arrays of shape (len(pairs), num_bars),
+    each pair's latest bar in the last column; pairs with fewer bars are padded with NaT/NaN on the left.
+    """
+    row_of = {pair.upper(): row for row, pair in enumerate(pairs)}
+    timestamps = np.full((len(pairs), num_bars), np.datetime64('NaT'), dtype='datetime64[ms]')
+    values = np.full((len(pairs), num_bars), np.nan, dtype=np.float64)
+    bars = bars[bars['pair'].isin(row_of)]
+    rows = bars['pair'].map(row_of).to_numpy()
+    # Rows are sorted by pair and time, so counting back from each pair's last bar gives its column
+    cols = num_bars - 1 - bars.groupby('pair', sort=False).cumcount(ascending=False).to_numpy()
+    keep = cols >= 0
+    timestamps[rows[keep], cols[keep]] = bars['timestamp'].to_numpy(dtype='datetime64[ms]')[keep]
+    values[rows[keep], cols[keep]] = bars[column].to_numpy(dtype=np.float64)[keep]
+    return timestamps, values
+
+def legacy_tables(engine):
+    """
+    Names of the per-pair circular buffer tables (slot, timestamp, close) written by earlier versions.
+    """
+    inspector = inspect(engine)
+    return [table for table in inspector.get_table_names()
+            if table.isalnum() and {column['name'] for column in inspector.get_columns(table)} == {'slot', 'timestamp', 'close'}]
+
+def migrate_legacy_tables(engine, timeframe=BAR_INTERVAL, drop=False):
+    """
+    Copy the bars of every per-pair table into the bars table under `timeframe`, one transaction per pair.
+    Bars already present are kept, so the migration can be rerun; with `drop`, each legacy table is
+    dropped once copied. Returns the number of bars copied per pair.
+    """
+    create_bars_table(engine)
+    copied = {}
+    for table in legacy_tables(engine):
+        pair = table.upper()
+        # The table name comes from the schema and is alphanumeric, so it is safe to interpolate
+        query = text(f"""
+        INSERT INTO bars (pair, timeframe, timestamp, close)
+        SELECT :pair, :timeframe, timestamp, close FROM {table}
+        WHERE timestamp IS NOT NULL
+        ON CONFLICT (pair, timeframe, timestamp) DO NOTHING;
+        """)
+        with engine.begin() as conn:
+            copied[pair] = conn.execute(query, {"pair": pair, "timeframe": timeframe}).rowcount
+            if drop:
+                conn.execute(text(f"DROP TABLE {table};"))
+        print(f"Migrated {copied[pair]} bars for {pair}{' and dropped its table' if drop else ''}")
+    return copied
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate the per-pair bar tables into the unified bars table.")
+    parser.add_argument('--database', default=None, help="SQLAlchemy database URL (defaults to DATABASE_URL)")
+    parser.add_argument('--timeframe', type=int, default=BAR_INTERVAL, help="Timeframe (seconds) the legacy bars were built at")
+    parser.add_argument('--drop', action='store_true', help="Drop each legacy table after copying it")
+    args = parser.parse_args()
+
+    if args.database:
+        engine = sqlalchemy.create_engine(args.database)
+    else:
+        from storage import engine
+    copied = migrate_legacy_tables(engine, args.timeframe, args.drop)
+    print(f"Migrated {sum(copied.values())} bars from {len(copied)} tables")
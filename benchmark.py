@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing as mp
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime
+import numpy as np
+
+# Start of the synthetic streams' event times, fixed so every run replays the same bars
+SYNTHETIC_START_MS = 1700000000000
+
+def synthetic_messages(pairs, ticks=3600, seed=0, tick_ms=1000):
+    """
+    Deterministic ticker payloads for `pairs`, one per pair every `tick_ms`, interleaved in event-time order.
+
+    Each pair follows a seeded random walk around a slow sine wave, so the MA-crossover strategy
+    sees regular crossovers, take-profits and trailing stops.
+    """
+    rng = np.random.default_rng(seed)
+    steps = np.arange(ticks)
+    paths = {}
+    for i, pair in enumerate(pairs):
+        drift = np.cumsum(rng.normal(0, 0.0004, ticks))
+        cycle = 0.02 * np.sin(2 * np.pi * steps / rng.uniform(1800, 5400) + rng.uniform(0, 2 * np.pi))
+        closes = np.round(100 * (i + 1) * np.exp(drift + cycle), 4)
+        volumes = np.round(np.cumsum(rng.uniform(0, 5, ticks)), 4)
+        paths[pair.upper()] = (closes, volumes)
+
+    messages = []
+    for t in range(ticks):
+        event_time = SYNTHETIC_START_MS + t * tick_ms
+        for pair, (closes, volumes) in paths.items():
+            messages.append({'e': '24hrTicker', 'E': event_time, 's': pair, 'c': str(closes[t]), 'v': str(volumes[t])})
+    return messages
+
+def _serve_replay(recording, pairs, ticks, seed, speed, url_queue, stop_event):
+    """
+    Replay server process: kept out of the measured process so its CPU and GIL time are not counted.
+    """
+    from replay_server import ReplayServer, load_recording
+    messages = load_recording(recording) if recording else synthetic_messages(pairs, ticks, seed)
+    server = ReplayServer(messages, speed=speed)
+    url_queue.put((server.start(), len(messages)))
+    stop_event.wait()
+    server.stop()
+
+class LatencyProbe:
+    """
+    Wall-clock timestamps along the live path, attached to the real objects by wrapping a few of
+    their methods: payload dispatch, bar close, strategy decision and order arrival at the exchange.
+
+    Latencies are measured from the moment the payload that closed a bar is dispatched to its
+    pair's handler, i.e. after the WebSocket frame has been received and decoded.
+    """
+
+    def __init__(self):
+        self.tick_time = {}  # Pair -> dispatch time of its latest payload
+        self.bar_close = {}  # (pair, bar seq) -> dispatch time of the payload that closed the bar
+        self.evaluating = {}  # Pair -> seq of the newest bar handed to the strategies
+        self.order_origin = {}  # Pair -> dispatch time behind the order being sent
+        self.decision = []  # Tick-to-decision for every bar evaluation, seconds
+        self.signal = []  # Tick-to-decision for evaluations that produced a BUY or SELL
+        self.order = []  # Tick-to-order: until the exchange receives the order
+        self.first_tick = None
+        self.last_tick = None
+        self.ticks = 0
+
+    def wrap_handler(self, pair, handler):
+        def timed(message):
+            now = time.perf_counter()
+            if self.first_tick is None:
+                self.first_tick = now
+            self.last_tick = now
+            self.ticks += 1
+            self.tick_time[pair] = now
+            handler(message)
+        return timed
+
+    def instrument_buffer(self, pair, price_buffer):
+        append, since = price_buffer.append, price_buffer.since
+
+        def timed_append(timestamp, close):
+            append(timestamp, close)
+            self.bar_close[(pair, price_buffer.seq)] = self.tick_time.get(pair)
+
+        def timed_since(seq):
+            result = since(seq)
+            self.evaluating[pair] = result[0]
+            return result
+
+        price_buffer.append = timed_append
+        price_buffer.since = timed_since
+
+    def instrument_strategy(self, strategy):
+        on_bar = strategy.on_bar
+
+        def timed_on_bar(price):
+            side = on_bar(price)
+            origin = self.bar_close.get((strategy.pair, self.evaluating.get(strategy.pair)))
+            if origin is not None:
+                elapsed = time.perf_counter() - origin
+                self.decision.append(elapsed)
+                if side:
+                    self.signal.append(elapsed)
+                    self.order_origin[strategy.pair] = origin
+            return side
+
+        strategy.on_bar = timed_on_bar
+
+    def instrument_exchange(self, exchange):
+        market_order = exchange.market_order
+
+        def timed_market_order(pair, side, quantity):
+            origin = self.order_origin.pop(pair, None)
+            if origin is not None:
+                self.order.append(time.perf_counter() - origin)
+            return market_order(pair, side, quantity)
+
+        exchange.market_order = timed_market_order
+
+def latency_summary(samples):
+    """
+    Count, p50, p99 and max of latency samples, in milliseconds.
+    """
+    if not samples:
+        return {'count': 0, 'p50_ms': None, 'p99_ms': None, 'max_ms': None}
+    values = np.asarray(samples) * 1000
+    return {
+        'count': len(values),
+        'p50_ms': round(float(np.percentile(values, 50)), 4),
+        'p99_ms': round(float(np.percentile(values, 99)), 4),
+        'max_ms': round(float(values.max()), 4),
+    }
+
+def current_rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        return None
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmark(pairs, ticks=3600, speed=None, seed=0, recording=None, time_interval=20, timeout=600, workdir=None):
+    """
+    Replay a ticker stream through ingest, strategies and the order gateway, and measure it.
+
+    The stream is served over a local WebSocket by replay_server in a separate process; orders go
+    to MockExchange. The database, tick archive, state snapshots and strategy configuration live
+    in a scratch directory, so runs never touch real data and start from the same empty state.
+
+    Parameters:
+    pairs (list): Pairs to replay (and trade).
+    ticks (int): Synthetic payloads per pair, one per second of event time.
+    speed (float): Replay speed relative to event time, e.g. 1 (real time) to 1000; None sends as fast as possible.
+    recording (str): JSON-lines recording (replay_server.record) to replay instead of the synthetic stream.
+
+    Returns a JSON-serializable dict of configuration, environment and results.
+    """
+    pairs = [pair.upper() for pair in pairs]
+    workdir = workdir or tempfile.mkdtemp(prefix='tradebot-bench-')
+    config_path = os.path.join(workdir, 'strategies.json')
+    with open(config_path, 'w') as f:
+        json.dump([{"strategy": "ma_crossover", "pairs": pairs}], f)
+    # The modules below read these when first imported, so they must be set before the imports
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'TICK_ARCHIVE_DIR': os.path.join(workdir, 'ticks'),
+        'STATE_DIR': os.path.join(workdir, 'state'),
+        'STRATEGY_CONFIG': config_path,
+        'EXCHANGE': 'mock',
+    })
+    import execution
+    from bar_store import create_bars_table
+    from data_request import prepare_pair, get_bar_builder, persistence_sink, get_ingest_stats
+    from performance import performance_table_create
+    from price_buffer import get_buffer
+    from state_store import state_store
+    from storage import engine
+    from stream_client import MultiplexedStreamClient
+    from strategies import build_strategies, get_indicator_cache, load_strategy_config
+    from tick_archive import tick_archive
+
+    context = mp.get_context('spawn')
+    url_queue, stop_event = context.Queue(), context.Event()
+    server = context.Process(target=_serve_replay, args=(recording, pairs, ticks, seed, speed, url_queue, stop_event), daemon=True)
+    server.start()
+    url, total_messages = url_queue.get(timeout=120)
+
+    probe = LatencyProbe()
+    performance_table_create()
+    create_bars_table(engine)
+    persistence_sink.start()
+    tick_archive.start()
+    state_store.start()
+    execution.symbol_info_cache.ensure_loaded()
+    probe.instrument_exchange(execution.exchange)
+    execution.order_gateway.start()
+
+    handlers = {}
+    strategy_config = load_strategy_config()
+    for pair in pairs:
+        prepare_pair(pair, 200, time_interval)
+        probe.instrument_buffer(pair, get_buffer(pair))
+        handlers[pair] = probe.wrap_handler(pair, get_bar_builder(pair, 200, time_interval).on_message)
+        strategies = build_strategies(pair, get_indicator_cache(pair), strategy_config)
+        for strategy in strategies:
+            probe.instrument_strategy(strategy)
+        threading.Thread(target=execution.execute_trading_strategy, args=(engine, pair, time_interval, strategies),
+                         name=f"strategy-{pair}", daemon=True).start()
+
+    client = MultiplexedStreamClient(handlers, url, reconnect_delay=3600)
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    started = time.perf_counter()
+    client_thread = threading.Thread(target=lambda: asyncio.run(client.run()), name="bench-ingest", daemon=True)
+    client_thread.start()
+
+    rss_samples = []
+    while probe.ticks < total_messages and time.perf_counter() - started < timeout:
+        time.sleep(0.1)
+        rss_samples.append(current_rss_mb())
+    time.sleep(0.5)  # Let the strategy threads and the gateway finish the last bars
+    elapsed = time.perf_counter() - started
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+
+    client.stop()
+    stop_event.set()
+    server.join(10)
+
+    ingest = get_ingest_stats()
+    cpu_seconds = (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime)
+    active = (probe.last_tick - probe.first_tick) if probe.ticks > 1 else 0.0
+    rss_samples = [rss for rss in rss_samples if rss is not None]
+    result = {
+        'config': {
+            'pairs': len(pairs), 'ticks_per_pair': ticks, 'speed': speed, 'seed': seed,
+            'recording': recording, 'time_interval': time_interval,
+        },
+        'environment': {
+            'commit': git_commit(), 'python': platform.python_version(), 'platform': platform.platform(),
+            'cpus': os.cpu_count(), 'timestamp': datetime.now().isoformat(timespec='seconds'),
+        },
+        'results': {
+            'messages_expected': total_messages,
+            'messages_processed': probe.ticks,
+            'completed': probe.ticks >= total_messages,
+            'elapsed_s': round(elapsed, 3),
+            'throughput_msgs_per_s': round(probe.ticks / active, 1) if active else None,
+            'bars': sum(stats['bars'] for stats in ingest.values()),
+            'late_or_stale': sum(stats['late'] + stats['stale'] for stats in ingest.values()),
+            'orders': len(execution.exchange.orders),
+            'tick_to_decision': latency_summary(probe.decision),
+            'tick_to_signal': latency_summary(probe.signal),
+            'tick_to_order': latency_summary(probe.order),
+            'cpu_seconds': round(cpu_seconds, 3),
+            'cpu_percent': round(100 * cpu_seconds / elapsed, 1) if elapsed else None,
+            'peak_rss_mb': round(usage_after.ru_maxrss / 1024, 1),
+            'mean_rss_mb': round(float(np.mean(rss_samples)), 1) if rss_samples else None,
+        },
+    }
+    return result
+
+def compare(result, baseline):
+    """
+    Print each numeric result next to a baseline's, with the relative change.
+    """
+    def flatten(d, prefix=''):
+        for key, value in d.items():
+            if isinstance(value, dict):
+                yield from flatten(value, f"{prefix}{key}.")
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                yield f"{prefix}{key}", value
+
+    before = dict(flatten(baseline['results']))
+    print(f"{'metric':<32}{'baseline':>14}{'current':>14}{'change':>10}")
+    for key, value in flatten(result['results']):
+        old = before.get(key)
+        change = f"{(value - old) / old:+.1%}" if old not in (None, 0) and not math.isnan(old) else ''
+        print(f"{key:<32}{old if old is not None else '-':>14}{value:>14}{change:>10}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay ticker streams through the trading pipeline and measure throughput and latency.")
+    parser.add_argument('--pairs', type=int, default=10, help="Number of synthetic pairs")
+    parser.add_argument('--ticks', type=int, default=3600, help="Synthetic payloads per pair (one per second of event time)")
+    parser.add_argument('--speed', type=float, default=None, help="Replay speed, e.g. 1 for real time or 1000; as fast as possible by default")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--recording', help="Replay a recorded JSON-lines file instead of synthetic data")
+    parser.add_argument('--record-pairs', nargs='+', help="Pairs to take from the recording")
+    parser.add_argument('--output', default='benchmark_results.json', help="Where to write the JSON results")
+    parser.add_argument('--compare', help="Earlier results JSON to compare against")
+    parser.add_argument('--keep', action='store_true', help="Keep the scratch directory")
+    args = parser.parse_args()
+
+    if args.recording:
+        from replay_server import load_recording
+        pairs = args.record_pairs or sorted({m['s'] for m in load_recording(args.recording)})
+    else:
+        pairs = [f"SYN{i:03d}USDT" for i in range(args.pairs)]
+
+    workdir = tempfile.mkdtemp(prefix='tradebot-bench-')
+    try:
+        result = run_benchmark(pairs, args.ticks, args.speed, args.seed, args.recording, workdir=workdir)
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(json.dumps(result['results'], indent=2))
+    print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(result, json.load(f))
+    os._exit(0)  # Strategy and writer threads run forever; the measurements are done
@@ -0,0 +1,165 @@
+import threading
+from collections import deque
+from datetime import datetime
+import pandas as pd
+from sqlalchemy import text
+
+# Candle timeframes in seconds; each one must be a multiple of the one before it
+DEFAULT_TIMEFRAMES = (1, 20, 60, 300, 3600)
+
+class Candle:
+    """
+    Open/high/low/close/volume for one timeframe bucket.
+    `start` is the bucket start in milliseconds since the epoch. `volume` is None when any tick's volume is unknown.
+    """
+
+    __slots__ = ('start', 'open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, start, open, high, low, close, volume=0.0):
+        self.start = start
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    def add_tick(self, price, volume):
+        if price > self.high:
+            self.high = price
+        if price < self.low:
+            self.low = price
+        self.close = price
+        self.volume = None if self.volume is None or volume is None else self.volume + volume
+
+    def merge(self, candle):
+        """
+        Fold a later, lower-timeframe candle into this one.
+        """
+        if candle.high > self.high:
+            self.high = candle.high
+        if candle.low < self.low:
+            self.low = candle.low
+        self.close = candle.close
+        self.volume = None if self.volume is None or candle.volume is None else self.volume + candle.volume
+
+    @property
+    def timestamp(self):
+        """
+        Local wall-clock start time, matching the timestamps of the close-price bars.
+        """
+        return datetime.fromtimestamp(self.start / 1000)
+
+class CandleAggregator:
+    """
+    Builds OHLCV candles for one pair at several timeframes from a single tick stream.
+
+    Only the smallest timeframe is built from ticks; every larger timeframe is rolled up from
+    the closed candles of the timeframe below it. Closed candles are kept in a bounded history
+    per timeframe and passed to `on_close(pair, timeframe, candle)`.
+    """
+
+    def __init__(self, pair, timeframes=DEFAULT_TIMEFRAMES, history=500, on_close=None):
+        timeframes = sorted(timeframes)
+        for lower, higher in zip(timeframes, timeframes[1:]):
+            if higher % lower:
+                raise ValueError(f"Timeframe {higher}s is not a multiple of {lower}s.")
+        self.pair = pair.upper()
+        self.timeframes = timeframes
+        self.on_close = on_close
+        self.late = 0  # Ticks older than the open base candle, dropped
+        self._periods = [timeframe * 1000 for timeframe in timeframes]
+        self._open = [None] * len(timeframes)
+        self._history = {timeframe: deque(maxlen=history) for timeframe in timeframes}
+        self._lock = threading.Lock()
+
+    def on_tick(self, price, volume, event_time):
+        """
+        Apply one tick observed at `event_time` (milliseconds since the epoch), with None for an unknown volume.
+        """
+        with self._lock:
+            period = self._periods[0]
+            start = event_time - event_time % period
+            current = self._open[0]
+            if current is None or start > current.start:
+                if current is not None:
+                    self._close(0, current)
+                self._open[0] = Candle(start, price, price, price, price, volume)
+            elif start == current.start:
+                current.add_tick(price, volume)
+            else:
+                self.late += 1
+
+    def _close(self, level, candle):
+        timeframe = self.timeframes[level]
+        self._history[timeframe].append(candle)
+        if self.on_close is not None:
+            self.on_close(self.pair, timeframe, candle)
+
+        # Roll the closed candle up into the next timeframe
+        if level + 1 < len(self.timeframes):
+            period = self._periods[level + 1]
+            start = candle.start - candle.start % period
+            parent = self._open[level + 1]
+            if parent is None or start > parent.start:
+                if parent is not None:
+                    self._close(level + 1, parent)
+                self._open[level + 1] = Candle(start, candle.open, candle.high, candle.low, candle.close, candle.volume)
+            else:
+                parent.merge(candle)
+
+    def get_candles(self, timeframe, n=None, include_open=False):
+        """
+        Return the last `n` closed candles of a timeframe as a DataFrame, oldest first.
+        With `include_open`, the still-forming candle is appended as the last row.
+        """
+        with self._lock:
+            candles = list(self._history[timeframe])
+            if include_open:
+                current = self._open[self.timeframes.index(timeframe)]
+                if current is not None:
+                    candles.append(Candle(current.start, current.open, current.high, current.low, current.close, current.volume))
+        if n is not None:
+            candles = candles[-n:]
+        return pd.DataFrame({
+            'timestamp': [candle.timestamp for candle in candles],
+            'open': [candle.open for candle in candles],
+            'high': [candle.high for candle in candles],
+            'low': [candle.low for candle in candles],
+            'close': [candle.close for candle in candles],
+            'volume': [candle.volume for candle in candles],
+        })
+
+_aggregators = {}
+_aggregators_lock = threading.Lock()
+
+def get_aggregator(pair, timeframes=DEFAULT_TIMEFRAMES, on_close=None):
+    """
+    Return the shared candle aggregator for the given pair, creating it on first use.
+    """
+    key = pair.upper()
+    with _aggregators_lock:
+        aggregator = _aggregators.get(key)
+        if aggregator is None:
+            aggregator = CandleAggregator(key, timeframes, on_close=on_close)
+            _aggregators[key] = aggregator
+        return aggregator
+
+def get_candles(pair, timeframe, n=None, include_open=False):
+    """
+    Return recent in-memory candles for a pair and timeframe (seconds).
+    """
+    return get_aggregator(pair).get_candles(timeframe, n, include_open)
+
+def load_candles(engine, pair, timeframe, num_rows=100):
+    """
+    Load the most recent persisted candles for a pair and timeframe, oldest first.
+    """
+    query = text("""
+    SELECT timestamp, open, high, low, close, volume FROM bars
+    WHERE pair = :pair AND timeframe = :timeframe
+    ORDER BY timestamp DESC
+    LIMIT :num_rows;
+    """)
+    with engine.connect() as conn:
+        df = pd.read_sql(query, conn, params={"pair": pair.upper(), "timeframe": timeframe, "num_rows": num_rows})
+    return df.iloc[::-1].reset_index(drop=True)
@@ -1,96 +1,190 @@
-import sqlalchemy
-from sqlalchemy import text
 import websocket
 import ssl
 import certifi
 import json
 import time
-from datetime import datetime, timedelta
-from dotenv import load_dotenv
-import os
-
-# Load environment variables from .env file
-load_dotenv()
-db_url = os.getenv('DATABASE_URL', 'sqlite:///TradingData.db')
-
-# Initialize the database engine
-engine = sqlalchemy.create_engine(db_url)
-
-def create_table(engine, pair, buffer_size):
-    """
-    Creates a table for the circular buffer with a fixed number of slots.
-    """
-    with engine.connect() as conn:
-        query = text(f"""
-        CREATE TABLE IF NOT EXISTS {pair} (
-            slot INTEGER PRIMARY KEY,
-            timestamp DATETIME,
-            close REAL
-        );
-        """)
-        conn.execute(query)
-
-        index_query = text(f"CREATE INDEX IF NOT EXISTS idx_timestamp_{pair} ON {pair} (timestamp);")
-        conn.execute(index_query)
-        
-        count_query = text(f"SELECT COUNT(*) FROM {pair};")
-        current_slots = conn.execute(count_query).scalar()
-        if current_slots < buffer_size:
-            for slot in range(current_slots + 1, buffer_size + 1):
-                query_fill = text(f"INSERT INTO {pair} (slot) VALUES ({slot});")
-                conn.execute(query_fill)
-
-        conn.commit()
-        print(f"Table for {pair} with {buffer_size} slots is ready.")
-
-def get_next_slot(conn, pair):
-    """
-    Get the next available slot in the circular buffer.
-    """
-    query = text(f"""
-    SELECT slot
-    FROM {pair}
-    WHERE timestamp IS NULL
-    ORDER BY slot ASC
-    LIMIT 1;
-    """)
-    result = conn.execute(query)
-    slot = result.scalar()
-
-    if slot is not None:
-        return slot
-    else:
-        query = text(f"""
-        SELECT slot
-        FROM {pair}
-        ORDER BY timestamp ASC
-        LIMIT 1;
-        """)
-        result = conn.execute(query)
-        slot = result.scalar()
-        return slot
-
-def insert_data(engine, pair, timestamp, close, buffer_size):
-    """
-    Inserts data into the circular buffer, overwriting the oldest slot when full.
-    """
-    with engine.connect() as conn:
-        next_slot = get_next_slot(conn, pair)
-        insert_query = text(f"""
-        UPDATE {pair}
-        SET timestamp = :timestamp, close = :close
-        WHERE slot = :slot;
-        """)
-        conn.execute(insert_query, {"timestamp": timestamp, "close": close, "slot": next_slot})
-        conn.commit()
-        print(f"Inserted into slot {next_slot}: close={close}, timestamp={timestamp}")
+import asyncio
+from datetime import datetime
+from price_buffer import get_buffer
+from stream_client import MultiplexedStreamClient, BINANCE_STREAM_URL
+from candles import get_aggregator
+from bar_store import BAR_INTERVAL, create_bars_table, upsert_close_query, upsert_candle_query, close_rows, recent_closes
+from storage import engine, database_writer
+from tick_archive import tick_archive
+import metrics
+
+# Candle timeframes (seconds) built from the tick stream, and those written to the bars table
+CANDLE_TIMEFRAMES = (1, 20, 60, 300, 3600)
+PERSISTED_TIMEFRAMES = (20, 60, 300, 3600)
+
+class PersistenceSink:
+    """
+    Persists bars and candles into the unified bars table through the shared database writer thread,
+    off the ingest path. The in-memory price buffer is the hot read path; the database is only a durable copy.
+    Consecutive bars of any pairs are merged by the writer into one executemany.
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    def start(self):
+        self.writer.start()
+
+    def submit(self, pair, timeframe, timestamp, close):
+        self.writer.execute(upsert_close_query, {"pair": pair, "timeframe": timeframe, "timestamp": timestamp, "close": close})
+
+    def submit_many(self, pair, timeframe, bars):
+        """
+        Queue a batch of (timestamp, close) bars, e.g. a backfill, to be written with one executemany.
+        """
+        return self.writer.execute(upsert_close_query, close_rows(pair, timeframe, bars))
+
+    def submit_candle(self, pair, timeframe, candle):
+        self.writer.execute(upsert_candle_query, {
+            "pair": pair, "timeframe": timeframe, "timestamp": candle.timestamp,
+            "open": candle.open, "high": candle.high, "low": candle.low,
+            "close": candle.close, "volume": candle.volume
+        })
+
+persistence_sink = PersistenceSink(database_writer)
+
+class IngestStats:
+    """
+    Counters describing how well one pair's feed keeps up with the exchange.
+    """
+
+    def __init__(self):
+        self.messages = 0  # Ticker payloads received
+        self.bars = 0  # Bars closed and published
+        self.coalesced = 0  # Payloads folded into a bar that already had a price
+        self.late = 0  # Payloads whose bar had already been closed (dropped)
+        self.stale = 0  # Payloads older than one already applied to the open bar (dropped)
+        self.malformed = 0  # Payloads without a usable price or event time (dropped)
+        self.last_lag_ms = 0.0  # Receive time minus exchange event time of the latest payload
+        self.max_lag_ms = 0.0
+
+    def as_dict(self):
+        return dict(vars(self))
+
+class BarBuilder:
+    """
+    Turns one pair's ticker updates into fixed-interval close bars.
+    Each closed bar is published to the shared price buffer and handed to the persistence sink.
+
+    Payloads are bucketed by the exchange event time ('E') rather than the time they were read,
+    so a backlog drained in a burst still lands in the right bars: payloads for the open bar are
+    coalesced into it and payloads for an already closed bar are counted as late and dropped.
+    """
+
+    def __init__(self, pair, buffer_size, time_interval):
+        self.pair = pair.upper()
+        self.time_interval = time_interval
+        self.interval_ms = time_interval * 1000
+        self.price_buffer = get_buffer(pair, buffer_size)
+        self.stats = IngestStats()
+        self.bucket = None  # Index of the open bar, in intervals since the epoch
+        self.last_event_time = None
+        self.last_close_price = None
+        self.candles = get_aggregator(pair, CANDLE_TIMEFRAMES, on_close=self.on_candle_close)
+        self.tick_timer = metrics.tick_seconds.labels(self.pair)
+
+    def bar_time(self, bucket):
+        """
+        Local wall-clock start time of a bucket, matching the timestamps stored so far.
+        """
+        return datetime.fromtimestamp(bucket * self.interval_ms / 1000)
+
+    def on_tick(self, current_price, event_time):
+        """
+        Apply one price observed at `event_time` (milliseconds since the epoch).
+        Returns False when the tick was dropped as late or stale.
+        """
+        bucket = event_time // self.interval_ms
+
+        if self.bucket is None:
+            self.bucket = bucket
+        elif bucket < self.bucket:
+            self.stats.late += 1
+            return False
+        elif bucket == self.bucket:
+            if event_time < self.last_event_time:
+                self.stats.stale += 1
+                return False
+            self.stats.coalesced += 1
+        else:
+            last_time = self.bar_time(self.bucket)
+            self.price_buffer.append(last_time, self.last_close_price)
+            persistence_sink.submit(self.pair, self.time_interval, last_time, self.last_close_price)
+            self.stats.bars += 1
+            self.bucket = bucket
+
+        self.last_event_time = event_time
+        self.last_close_price = current_price
+        return True
+
+    def on_message(self, response):
+        """
+        Handle a decoded ticker payload from either the per-pair or the combined stream.
+        """
+        start = time.perf_counter()
+        self.apply_message(response)
+        self.tick_timer.observe(time.perf_counter() - start)
+
+    def apply_message(self, response):
+        received_time = time.time() * 1000
+        self.stats.messages += 1
+        try:
+            current_price = float(response["c"])
+            event_time = int(response.get("E", received_time))
+        except (KeyError, TypeError, ValueError):
+            self.stats.malformed += 1
+            return
+
+        lag = received_time - event_time
+        self.stats.last_lag_ms = lag
+        if lag > self.stats.max_lag_ms:
+            self.stats.max_lag_ms = lag
+
+        # A dropped tick is older than what candles, the archive and the latest price already hold
+        if not self.on_tick(current_price, event_time):
+            return
+        self.price_buffer.set_last_tick(current_price, event_time)
+        # The ticker only carries a rolling 24h volume, not what traded in the bucket, so candle volume is unknown
+        self.candles.on_tick(current_price, None, event_time)
+        tick_archive.append(self.pair, event_time, current_price)
+
+    def on_candle_close(self, pair, timeframe, candle):
+        if timeframe in PERSISTED_TIMEFRAMES:
+            persistence_sink.submit_candle(pair, timeframe, candle)
+
+bar_builders = {}
+
+def get_bar_builder(pair, buffer_size, time_interval):
+    """
+    Return the pair's bar builder, keeping its open bar and counters across reconnects.
+    """
+    key = pair.upper()
+    if key not in bar_builders:
+        bar_builders[key] = BarBuilder(pair, buffer_size, time_interval)
+    return bar_builders[key]
+
+def get_ingest_stats():
+    """
+    Return the ingest counters of every pair, keyed by symbol.
+    """
+    return {pair: builder.stats.as_dict() for pair, builder in bar_builders.items()}
 
 def start_websocket(pair, buffer_size, time_interval):
     """
-    Start a WebSocket connection to Binance and insert data into the circular buffer.
-    Automatically reconnects if the connection is lost.
+    Start a WebSocket connection to Binance, publish closed bars to the shared price buffer
+    and hand them to the persistence sink. Automatically reconnects if the connection is lost.
     """
+    reconnects = metrics.websocket_reconnects.labels('threads')
+    first_attempt = True
     while True:
+        if not first_attempt:
+            reconnects.inc()
+        first_attempt = False
         try:
             print(f"Connecting to WebSocket for pair: {pair.upper()}")
             sslopt = {"ca_certs": certifi.where()}
@@ -110,31 +204,11 @@ def start_websocket(pair, buffer_size, time_interval):
             continue
 
         try:
-            last_time = None
-            last_close_price = None        
+            bar_builder = get_bar_builder(pair, buffer_size, time_interval)
 
+            # Drain the socket continuously; bars are bucketed by event time, so no pacing is needed
             while True:
-                response = json.loads(ws.recv())
-                current_price = float(response["c"])
-                current_time = datetime.now()
-                current_time_rounded = current_time.replace(
-                    second=(current_time.second // time_interval) * time_interval,
-                    microsecond=0
-                )
-
-                if last_time is None:
-                    last_time = current_time_rounded
-                    last_close_price = current_price
-                    continue
-
-                if current_time_rounded - last_time >= timedelta(seconds=time_interval):
-                    insert_data(engine, pair.upper(), last_time, last_close_price, buffer_size)
-                    last_time = current_time_rounded
-
-                last_close_price = current_price
-
-                # Optional: remove or adjust this delay depending on your needs
-                time.sleep(1)
+                bar_builder.on_message(json.loads(ws.recv()))
 
         except (websocket.WebSocketException, ConnectionResetError) as e:
             print(f"WebSocket error: {e} — attempting to reconnect in 5 seconds...")
@@ -148,16 +222,46 @@ def start_websocket(pair, buffer_size, time_interval):
             except:
                 pass  # Ignore errors during cleanup
 
+def prepare_pair(pair, buffer_size, time_interval=BAR_INTERVAL):
+    """
+    Warm the pair's shared buffer with its latest bars from the previous run, unless it already holds bars.
+    """
+    price_buffer = get_buffer(pair, buffer_size)
+    if price_buffer.seq == 0:
+        timestamps, closes = recent_closes(engine, pair, time_interval, buffer_size)
+        price_buffer.extend(timestamps, closes)
+
 def run(pair):
     """
     Run the WebSocket for the given trading pair.
     """
     buffer_size = 200
-    time_interval = 20
-    create_table(engine, pair, buffer_size)
+    time_interval = BAR_INTERVAL
+    create_bars_table(engine)
+    prepare_pair(pair, buffer_size, time_interval)
+    persistence_sink.start()
+    tick_archive.start()
     start_websocket(pair, buffer_size, time_interval)
     print("WebSocket started for the pair:", pair)
 
+def run_multiplexed(pairs, stream_url=BINANCE_STREAM_URL):
+    """
+    Run ingestion for all pairs on one asyncio event loop over shared combined-stream connections.
+    """
+    buffer_size = 200
+    time_interval = BAR_INTERVAL
+    create_bars_table(engine)
+    handlers = {}
+    for pair in pairs:
+        prepare_pair(pair, buffer_size, time_interval)
+        handlers[pair.upper()] = get_bar_builder(pair, buffer_size, time_interval).on_message
+    persistence_sink.start()
+    tick_archive.start()
+
+    client = MultiplexedStreamClient(handlers, stream_url)
+    print(f"Starting multiplexed WebSocket ingestion for {len(handlers)} pairs")
+    asyncio.run(client.run())
+
 if __name__ == "__main__":
 
 
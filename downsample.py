@@ -0,0 +1,65 @@
+import numpy as np
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling: pick `threshold` points that keep the visual shape of the series.
+
+    Parameters:
+    x (np.ndarray): Increasing x values (e.g. epoch milliseconds).
+    y (np.ndarray): Values at each x.
+    threshold (int): Number of points to return, at least 3.
+
+    Returns the indices of the selected points.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Bucket edges over the points between the fixed first and last ones
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the third triangle vertex
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        bucket_x = x[start:end]
+        bucket_y = y[start:end]
+        areas = np.abs((x[a] - avg_x) * (bucket_y - y[a]) - (x[a] - bucket_x) * (avg_y - y[a]))
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+def minmax(x, y, threshold):
+    """
+    Min/max bucketing: split the series into threshold/2 buckets and keep each bucket's lowest and highest point.
+    Cheaper than LTTB and never hides spikes. Returns the indices of the selected points.
+    """
+    n = len(x)
+    buckets = threshold // 2
+    if threshold >= n or buckets < 1:
+        return np.arange(n)
+
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    starts = edges[:-1]
+    # reduceat gives per-bucket extremes; argmin/argmax inside each bucket follow from a masked search
+    lows = np.minimum.reduceat(y, starts)
+    highs = np.maximum.reduceat(y, starts)
+    bucket_of = np.repeat(np.arange(buckets), np.diff(edges))
+    positions = np.arange(n)
+    low_idx = np.full(buckets, n, dtype=np.int64)
+    high_idx = np.full(buckets, n, dtype=np.int64)
+    np.minimum.at(low_idx, bucket_of, np.where(y == lows[bucket_of], positions, n))
+    np.minimum.at(high_idx, bucket_of, np.where(y == highs[bucket_of], positions, n))
+    return np.unique(np.concatenate((low_idx, high_idx)))
+
+METHODS = {'lttb': lttb, 'minmax': minmax}
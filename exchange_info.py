@@ -0,0 +1,78 @@
+import threading
+import time
+
+class SymbolInfoCache:
+    """
+    In-memory cache of exchange symbol metadata (LOT_SIZE and the other filters).
+
+    All symbols are loaded with a single exchange-info request. Once the TTL expires the
+    cached entries keep being served while a background thread refreshes them, so lookups
+    on the order path never wait on the network after the first load.
+    """
+
+    def __init__(self, client, ttl=3600):
+        self.client = client
+        self.ttl = ttl
+        self._symbols = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()  # Held across the first load so only one thread requests exchange info
+        self._refreshing = False
+
+    def refresh(self):
+        """
+        Reload metadata for every symbol from exchange info.
+        """
+        info = self.client.get_exchange_info()
+        symbols = {symbol['symbol']: symbol for symbol in info['symbols']}
+        with self._lock:
+            self._symbols = symbols
+            self._loaded_at = time.monotonic()
+            self._refreshing = False
+        print(f"Loaded exchange metadata for {len(symbols)} symbols.")
+
+    def ensure_loaded(self):
+        """
+        Load the cache if it has never been loaded; safe to call from every pair thread.
+        Concurrent callers wait for the one load in flight instead of each requesting exchange info.
+        """
+        with self._lock:
+            if self._loaded_at is not None:
+                return
+        with self._load_lock:
+            with self._lock:
+                if self._loaded_at is not None:
+                    return
+            self.refresh()
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            with self._lock:
+                self._refreshing = False
+            print(f"Error refreshing exchange metadata: {e}")
+
+    def get(self, symbol):
+        """
+        Return the cached exchange-info entry for a symbol, or None if the exchange does not list it.
+        """
+        self.ensure_loaded()
+        with self._lock:
+            expired = time.monotonic() - self._loaded_at > self.ttl
+            if expired and not self._refreshing:
+                self._refreshing = True
+                threading.Thread(target=self._refresh_in_background, name="symbol-info-refresh", daemon=True).start()
+            return self._symbols.get(symbol)
+
+    def get_filter(self, symbol, filter_type):
+        """
+        Return one of the symbol's filters (e.g. 'LOT_SIZE'), or None if it has none.
+        """
+        symbol_info = self.get(symbol)
+        if symbol_info is None:
+            return None
+        for filter in symbol_info['filters']:
+            if filter['filterType'] == filter_type:
+                return filter
+        return None
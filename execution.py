@@ -1,117 +1,76 @@
-import pandas as pd
-import sqlalchemy
-from sqlalchemy import text
 from dotenv import load_dotenv
 import os
 from binance.client import Client
 import math
 import time
-from datetime import datetime, timedelta
+from datetime import datetime
 from performance import insert_trade_performance
+from storage import engine as storage_engine
+from price_buffer import get_buffer
+from strategies import get_indicator_cache, load_strategy_config, build_strategies, configured_pairs
+from exchange_info import SymbolInfoCache
+from order_gateway import OrderGateway, BinanceExchange, MockExchange
+from state_store import state_store
+from bar_store import BAR_INTERVAL, load_recent_bars
+from portfolio import portfolio, ORDER_NOTIONAL
+import metrics
 
 # Load environment variables from .env file
 load_dotenv()
 api_key = os.getenv('BINANCE_API_KEY')
 api_secret = os.getenv('BINANCE_SECRET_KEY')
 
-# Initialize the Binance client
-client = Client(api_key, api_secret, testnet=True)
+# EXCHANGE=mock paper-trades offline: orders fill locally at the streamed price and the mock also serves exchange metadata
+if os.getenv('EXCHANGE') == 'mock':
+    exchange = MockExchange(symbols=configured_pairs(load_strategy_config()))
+    client = exchange
+else:
+    # Initialize the Binance client
+    client = Client(api_key, api_secret, testnet=True)
+    exchange = BinanceExchange(api_key, api_secret, testnet=True)
 
-# Initialize the database engine
-engine = sqlalchemy.create_engine('sqlite:///TradingData.db')
+# Exchange metadata for every symbol, loaded once and refreshed in the background
+symbol_info_cache = SymbolInfoCache(client, ttl=3600)
 
-def fetch_recent_rows(engine, pair='BTCUSDT', num_rows=100):
-    """
-    Fetch the most recent rows from the database for the given trading pair.
-    """
-    query = text(f"""
-    SELECT * FROM {pair}
-    ORDER BY timestamp DESC
-    LIMIT :num_rows;
-    """)
-    with engine.connect() as conn:
-        df = pd.read_sql(query, conn, params={"num_rows": num_rows})
-    df = df.iloc[::-1].reset_index(drop=True)
-    df.dropna(inplace=True)
-    df.set_index('slot', inplace=True)
-    return df
-
-def calculate_last_two_MA(data, short_window=9, long_windows=[20, 50, 100]):
-    """
-    Calculate the last two values of moving averages (MA) for the given data.
-    
-    Parameters:
-    data (pd.DataFrame): DataFrame containing the 'close' prices.
-    short_window (int): The window size for the short-term MA, default is 9.
-    long_windows (list): List of window sizes for the long-term MAs, default is [20, 50, 100].
-    
-    Returns:
-    dict: A dictionary containing the last two values of the short-term MA and each long-term MA.
-    """
-    ma_values = {}
-    
-    # Calculate the last two values of the short-term MA
-    ma_values['MA9'] = data['close'].rolling(window=short_window).mean().iloc[-2:].values
-    
-    # Calculate the last two values of each long-term MA
-    for window in long_windows:
-        ma_values[f'MA{window}'] = data['close'].rolling(window=window).mean().iloc[-2:].values
-    
-    return ma_values
+# Orders are sent by the gateway's worker pool
+order_gateway = OrderGateway(exchange, workers=4)
 
+# Shared database engine from storage.py
+engine = storage_engine
 
-def check_for_buy_signal(data):
-    """
-    Check for a bullish crossover where MA9 crosses above MA20, MA50, or MA100.
-    """
-    ma_values = calculate_last_two_MA(data)
-    ma9_prev, ma9_curr = ma_values['MA9']
-
-    for window in [20, 50, 100]:
-        ma_long_prev, ma_long_curr = ma_values[f'MA{window}']
-        if ma9_prev < ma_long_prev and ma9_curr > ma_long_curr:
-            return True
-
-    return False
-
-
-def check_for_sell_signal(current_price, entry_price, highest_price):
+def fetch_recent_rows(engine, pair='BTCUSDT', num_rows=100):
     """
-    Check if the sell condition is met based on:
-    - Fall 1.3% from the highest price.
-    - 1% profit target reached.
+    Fetch the most recent bars from the database for the given trading pair, oldest first.
     """
-    # Check for profit target (1% profit)
-    profit_threshold = 1.01  # 1% profit
-    if current_price >= entry_price * profit_threshold:
-        print("Profit target reached: 1% profit!")
-        return True
-    
-    # Check for fall from highest price (1.3% fall)
-    loss_threshold = 0.987  # 1.3% fall
-    if current_price <= highest_price * loss_threshold:
-        print("Sell signal due to 1.3% fall from highest price!")
-        return True
-    
-    return False
+    df = load_recent_bars(engine, [pair], BAR_INTERVAL, num_rows)
+    return df.drop(columns='pair')
 
-def get_price(symbol):
+def get_price(symbol, max_age=60):
     """
-    Fetch the current price for the given symbol from Binance.
+    Return the current price for the given symbol.
+    Uses the latest tick from the WebSocket feed and only falls back to a REST request
+    when no tick newer than `max_age` seconds is in memory.
     """
+    price, event_time = get_buffer(symbol).last_tick
+    if price is not None and time.time() - event_time / 1000 <= max_age:
+        return price
     ticker = client.get_symbol_ticker(symbol=symbol)
     return float(ticker['price'])
 
 def get_symbol_info(symbol):
     """
-    Retrieve the symbol's trading info, including minimum quantity and step size.
+    Retrieve the symbol's trading info, including minimum quantity and step size, from the metadata cache.
     """
-    symbol_info = client.get_symbol_info(symbol)
+    symbol_info = symbol_info_cache.get(symbol)
+    if symbol_info is None:
+        raise ValueError(f"Symbol {symbol} is not listed on the exchange.")
     return symbol_info
 
-def get_trade_quantity(symbol, amount_range=(10, 50)):
+def get_trade_quantity(symbol, amount_range=(10, 50), notional=None):
     """
     Calculate the trade quantity within the given amount range, ensuring it's above the minimum.
+    With `notional` (e.g. capital granted by the portfolio), buy at most that much instead,
+    returning 0 when it cannot pay for the minimum quantity.
     """
     price = get_price(symbol)
     symbol_info = get_symbol_info(symbol)
@@ -129,7 +88,7 @@ def get_trade_quantity(symbol, amount_range=(10, 50)):
         raise ValueError("Minimum quantity or step size not found for this symbol.")
 
 
-    max_quantity = amount_range[1] / price
+    max_quantity = (amount_range[1] if notional is None else notional) / price
 
     # Calculate the number of decimal places in step_size
     step_precision = abs(int(round(math.log10(step_size))))
@@ -143,66 +102,148 @@ def get_trade_quantity(symbol, amount_range=(10, 50)):
 
     # Ensure the quantity doesn't exceed the maximum allowable quantity within the amount range
     if rounded_quantity < min_quantity:
+        if notional is not None:
+            return 0.0
         rounded_quantity = min_quantity
 
     return rounded_quantity
 
-def execute_trading_strategy(engine, pair='BTCUSDT', interval_seconds=20):
-    """
-    Execute the trading strategy by checking for buy/sell signals and placing orders.
-    """
-    position = False  # Set initial position state
-    last_timestamp = None  # Initialize the last timestamp to track changes
-    highest_price = None  # Track the highest price since the buy order
-
+def execute_trading_strategy(engine, pair='BTCUSDT', interval_seconds=20, strategies=None):
+    """
+    Run every strategy configured for the pair: feed each new bar into the pair's shared indicator
+    cache once, let each strategy decide, and place the orders it asks for.
+    Position and indicator state are snapshotted on every change and restored on restart.
+    """
+    price_buffer = get_buffer(pair)
+    cache = get_indicator_cache(pair)
+    if strategies is None:
+        strategies = build_strategies(pair, cache, load_strategy_config())
+    last_bar = None  # Timestamp (ms) of the last bar fed into the indicators
+    wakeup_lag = metrics.strategy_wakeup_lag.labels(pair)
+    decision_seconds = metrics.strategy_decision_seconds.labels(pair)
+    print(f"Running {', '.join(s.name for s in strategies)} on {pair} with {len(cache)} shared indicators")
+
+    def save_state():
+        state_store.save(pair, {
+            'last_bar': last_bar,
+            'indicators': cache.get_state(),
+            'strategies': {strategy.name: strategy.get_state() for strategy in strategies},
+        })
+
+    # Seed the indicators from the backfilled history; signals are only checked on bars that arrive live
+    last_seq, timestamps, closes = price_buffer.snapshot()  # last_seq: sequence number of the last bar the strategy has seen
+    bar_times = timestamps.astype('int64')
+    saved = state_store.load(pair)
+    if saved is not None:
+        for strategy in strategies:
+            strategy_state = saved['strategies'].get(strategy.name)
+            if strategy_state is None:
+                continue
+            strategy.set_state(strategy_state)
+            print(f"Restored {strategy.name} on {pair}: position={strategy.position}, entry_price={strategy.entry_price}, quantity={strategy.quantity}")
+            if strategy.position and strategy.quantity:
+                portfolio.on_fill(pair, 'BUY', strategy.quantity, strategy.entry_price)
+            if strategy_state['pending_side']:
+                print(f"A {strategy_state['pending_side']} order for {strategy.name} on {pair} was in flight at shutdown; check its status on the exchange.")
+        # Saved indicators are only reused when they cover every indicator now in use and the buffer continues them without a gap
+        covered = set(saved['indicators']) >= set(cache.indicators.indicators)
+        if covered and saved['last_bar'] is not None and len(bar_times) and bar_times[0] <= saved['last_bar']:
+            cache.set_state(saved['indicators'])
+            closes = closes[bar_times > saved['last_bar']]
+            last_bar = saved['last_bar']
+            print(f"Restored indicators for {pair} from the snapshot")
+    cache.update_many(closes)
+    if len(bar_times):
+        last_bar = int(bar_times[-1])
+    print(f"Indicators for {pair} warmed up from {len(closes)} bars")
+
+    wakeups = price_buffer.wakeups
     while True:
-        df = fetch_recent_rows(engine, pair)
-        if df.empty:
-            print(f"No data available for {pair}. Skipping iteration...")
-            time.sleep(interval_seconds)
+        # Sleep until the data thread publishes a new bar (or an order fills) instead of polling the database
+        seq = price_buffer.wait_for_bar(last_seq, timeout=interval_seconds * 3, wakeups=wakeups)
+        # Read before checking the orders, so a fill that lands after the check still ends the next wait
+        wakeups = price_buffer.wakeups
+
+        order_completed = False
+        for strategy in strategies:
+            if strategy.pending_order is None or not strategy.pending_order.done():
+                continue
+            order_completed = True
+            side = strategy.pending_side
+            filled = False
+            try:
+                order = strategy.pending_order.result()
+                fill_price = float(order['fills'][0]['price'])
+                strategy.on_fill(side, fill_price)
+                portfolio.on_fill(pair, side, strategy.quantity, fill_price, strategy.reserved)
+                filled = True
+                print(f"{side.capitalize()} order for {strategy.name} placed successfully:", order)
+                if side == 'SELL':
+                    insert_trade_performance(engine, pair, strategy.entry_stamp, strategy.entry_price, fill_price, strategy.quantity)
+            except Exception as e:
+                print(f"Error placing {side.lower()} order for {strategy.name}:", e)
+                if not filled:
+                    portfolio.release(pair, strategy.reserved)
+            strategy.pending_order = None
+            strategy.reserved = 0.0
+        if order_completed:
+            save_state()
+
+        if seq == last_seq:
+            if not order_completed and all(strategy.pending_order is None for strategy in strategies):
+                print(f"No new data available for {pair}. Waiting...")
             continue
-
-        new_timestamp = df['timestamp'].iloc[-1]
-        if new_timestamp != last_timestamp:
-            last_timestamp = new_timestamp
-            print(f"New data detected at {new_timestamp}, executing strategy...")
-
-            current_price = df['close'].iloc[-1]
-
-            if not position and check_for_buy_signal(df):
-                print("Buy signal detected! Placing order...")
-                quantity = get_trade_quantity(pair)
-                print(f"Trade quantity for {pair}: {quantity}")
+        wakeup_lag.observe(time.time() - price_buffer.last_append)
+        decision_start = time.perf_counter()
+        # Only feed the bars appended since the last wakeup into the indicators, once for all strategies
+        last_seq, timestamps, closes = price_buffer.since(last_seq)
+        cache.update_many(closes)
+        last_bar = int(timestamps[-1].astype('int64'))
+        print(f"New data detected at {timestamps[-1]}, executing strategy...")
+
+        current_price = float(closes[-1])
+        decisions = [(strategy, strategy.on_bar(current_price)) for strategy in strategies]
+        # Capital for every BUY signal on this bar is granted in one pass against the portfolio's caps
+        buys = [strategy for strategy, side in decisions if side == 'BUY']
+        grants = dict(zip(buys, portfolio.allocate([pair] * len(buys), [ORDER_NOTIONAL] * len(buys)))) if buys else {}
+        decision_seconds.observe(time.perf_counter() - decision_start)
+        for strategy, side in decisions:
+            if side is not None:
+                metrics.signals.labels(pair, strategy.name, side).inc()
+            if side == 'BUY':
+                print(f"Buy signal detected by {strategy.name}! Placing order...")
+                grant = float(grants[strategy])
                 try:
-                    order = client.order_market_buy(symbol=pair, quantity=quantity)
-                    entry_stamp = datetime.now().replace(second=(datetime.now().second // interval_seconds) * interval_seconds, microsecond=0)
-                    position = True
-                    entry_price = float(order['fills'][0]['price'])
-                    highest_price = entry_price  # Initialize highest price
-                    print("Order placed successfully:", order)
+                    quantity = get_trade_quantity(pair, notional=grant) if grant else 0.0
                 except Exception as e:
-                    print("Error placing order:", e)
-
-            elif position:
-                highest_price = max(highest_price, current_price)  # Update highest price
-                if check_for_sell_signal(current_price, entry_price, highest_price):
-                    print("Sell signal triggered based on profit/loss conditions. Placing sell order...")
-                    try:
-                        order = client.order_market_sell(symbol=pair, quantity=quantity)
-                        position = False
-                        print("Sell order placed successfully:", order)
-                        sell_price = float(order['fills'][0]['price'])
-                        insert_trade_performance(engine, pair, entry_stamp, entry_price, sell_price, quantity)
-                    except Exception as e:
-                        print("Error placing sell order:", e)
-
-        time.sleep(interval_seconds)
+                    portfolio.release(pair, grant)
+                    print(f"Error sizing buy for {strategy.name} on {pair}:", e)
+                    continue
+                if not quantity:
+                    portfolio.release(pair, grant)
+                    print(f"Buy for {strategy.name} on {pair} skipped: exposure caps leave {grant:.2f} to allocate")
+                    continue
+                strategy.quantity = quantity
+                strategy.reserved = grant
+                print(f"Trade quantity for {pair}: {strategy.quantity}")
+                strategy.entry_stamp = datetime.now().replace(second=(datetime.now().second // interval_seconds) * interval_seconds, microsecond=0)
+            elif side == 'SELL':
+                print(f"Sell signal triggered for {strategy.name} based on profit/loss conditions. Placing sell order...")
+            else:
+                continue
+            strategy.pending_order = order_gateway.submit(pair, side, strategy.quantity, callback=lambda *_: price_buffer.wake())
+            strategy.pending_side = side
+
+        save_state()
 
 def start_trading_strategy(pair):
     """
-    Start the trading strategy for the given pair after a delay.
+    Start the trading strategy for the given pair.
+    History is backfilled into the price buffer beforehand (see backfill.warm_start), so no warm-up delay is needed.
     """
-    time.sleep(300)
+    symbol_info_cache.ensure_loaded()
+    order_gateway.start()
+    state_store.start()
     execute_trading_strategy(engine, pair, 20)
 
 if __name__ == "__main__":
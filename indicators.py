@@ -0,0 +1,186 @@
+import math
+from collections import deque
+
+class StreamingIndicator:
+    """
+    Base class for indicators that are updated one bar at a time.
+
+    `value` holds the latest output and `prev` the one before it, so crossovers can be
+    checked without recomputing history. Both are NaN until the indicator has warmed up.
+    """
+
+    def __init__(self):
+        self.value = math.nan
+        self.prev = math.nan
+
+    def update(self, close):
+        """
+        Feed one closing price and return the new indicator value.
+        """
+        self.prev = self.value
+        self.value = self._next(close)
+        return self.value
+
+    def last_two(self):
+        return self.prev, self.value
+
+    def get_state(self):
+        """
+        Return the indicator's internal state as plain JSON-serializable values.
+        """
+        return {'value': self.value, 'prev': self.prev}
+
+    def set_state(self, state):
+        self.value = state['value']
+        self.prev = state['prev']
+
+    def _next(self, close):
+        raise NotImplementedError
+
+class SMA(StreamingIndicator):
+    """
+    Simple moving average maintained with a running sum, O(1) per bar.
+    """
+
+    # Recompute the running sum from the window now and then so float error cannot accumulate
+    resync_every = 10000
+
+    def __init__(self, window):
+        super().__init__()
+        self.window = window
+        self._values = deque(maxlen=window)
+        self._sum = 0.0
+        self._updates = 0
+
+    def _next(self, close):
+        if len(self._values) == self.window:
+            self._sum -= self._values[0]
+        self._values.append(close)
+        self._sum += close
+        self._updates += 1
+        if self._updates % self.resync_every == 0:
+            self._sum = math.fsum(self._values)
+        if len(self._values) < self.window:
+            return math.nan
+        return self._sum / self.window
+
+    def get_state(self):
+        return dict(super().get_state(), values=list(self._values), updates=self._updates)
+
+    def set_state(self, state):
+        super().set_state(state)
+        self._values = deque(state['values'], maxlen=self.window)
+        self._sum = math.fsum(self._values)
+        self._updates = state['updates']
+
+class EMA(StreamingIndicator):
+    """
+    Exponential moving average seeded with the SMA of the first `window` bars.
+    """
+
+    def __init__(self, window):
+        super().__init__()
+        self.window = window
+        self.alpha = 2.0 / (window + 1)
+        self._seed = SMA(window)
+
+    def _next(self, close):
+        if math.isnan(self.value):
+            return self._seed.update(close)
+        return self.value + self.alpha * (close - self.value)
+
+    def get_state(self):
+        return dict(super().get_state(), seed=self._seed.get_state())
+
+    def set_state(self, state):
+        super().set_state(state)
+        self._seed.set_state(state['seed'])
+
+class RSI(StreamingIndicator):
+    """
+    Relative Strength Index using Wilder's smoothing.
+    """
+
+    def __init__(self, window=14):
+        super().__init__()
+        self.window = window
+        self._last_close = None
+        self._avg_gain = 0.0
+        self._avg_loss = 0.0
+        self._count = 0
+
+    def _next(self, close):
+        if self._last_close is None:
+            self._last_close = close
+            return math.nan
+        change = close - self._last_close
+        self._last_close = close
+        gain = max(change, 0.0)
+        loss = max(-change, 0.0)
+        self._count += 1
+
+        if self._count <= self.window:
+            # Plain average over the first window of changes
+            self._avg_gain += gain / self.window
+            self._avg_loss += loss / self.window
+            if self._count < self.window:
+                return math.nan
+        else:
+            self._avg_gain = (self._avg_gain * (self.window - 1) + gain) / self.window
+            self._avg_loss = (self._avg_loss * (self.window - 1) + loss) / self.window
+
+        if self._avg_loss == 0:
+            return 100.0
+        rs = self._avg_gain / self._avg_loss
+        return 100.0 - 100.0 / (1.0 + rs)
+
+    def get_state(self):
+        return dict(super().get_state(), last_close=self._last_close, avg_gain=self._avg_gain,
+                    avg_loss=self._avg_loss, count=self._count)
+
+    def set_state(self, state):
+        super().set_state(state)
+        self._last_close = state['last_close']
+        self._avg_gain = state['avg_gain']
+        self._avg_loss = state['avg_loss']
+        self._count = state['count']
+
+class IndicatorSet:
+    """
+    Named collection of streaming indicators fed from the same price stream.
+    """
+
+    def __init__(self, indicators=None):
+        self.indicators = dict(indicators or {})
+
+    def add(self, name, indicator):
+        self.indicators[name] = indicator
+        return indicator
+
+    def update(self, close):
+        for indicator in self.indicators.values():
+            indicator.update(close)
+
+    def update_many(self, closes):
+        for close in closes:
+            self.update(float(close))
+
+    def last_two(self, name):
+        return self.indicators[name].last_two()
+
+    def get_state(self):
+        return {name: indicator.get_state() for name, indicator in self.indicators.items()}
+
+    def set_state(self, state):
+        """
+        Restore the indicators present in both the set and `state`; others keep their current state.
+        """
+        for name, indicator_state in state.items():
+            if name in self.indicators:
+                self.indicators[name].set_state(indicator_state)
+
+    def __getitem__(self, name):
+        return self.indicators[name]
+
+    def __contains__(self, name):
+        return name in self.indicators
@@ -1,15 +1,24 @@
 #!/usr/bin/env python
 # coding: utf-8
 
+import os
 import threading
-from execution import start_trading_strategy  # Import the execution logic from execution.py
-from data_request import run as data_request_run  # Import data fetching from data_request.py
+from execution import start_trading_strategy, order_gateway  # Import the execution logic from execution.py
+from data_request import run as data_request_run, run_multiplexed  # Import data fetching from data_request.py
 from performance import performance_table_create  # Import performance table creation from performance.py
+from price_buffer import get_buffer  # Import the shared in-memory price buffer from price_buffer.py
+from backfill import warm_start  # Import the historical backfill from backfill.py
+from strategies import load_strategy_config, configured_pairs  # Import the strategy configuration from strategies.py
+import metrics  # Import the Prometheus metrics from metrics.py
+from portfolio import portfolio  # Import the shared exposure caps from portfolio.py
 
 def main(pair):
     """
     Main function to start data fetching and trading execution threads.
     """
+    # Create the pair's shared price buffer up front; the data thread writes to it and the trade thread waits on it
+    get_buffer(pair)
+
     # Create threads for data fetching and trading execution
     data_thread = threading.Thread(target=data_request_run, args=(pair,))
     trade_thread = threading.Thread(target=start_trading_strategy, args=(pair,))
@@ -22,19 +31,52 @@ def main(pair):
     data_thread.join()
     trade_thread.join()
 
-if __name__ == "__main__":
-    performance_table_create()
-    pairs = ["BTCUSDT", "ETHUSDT", "BNBUSDT"]
+def main_multiplexed(pairs):
+    """
+    Ingest every pair over one asyncio WebSocket client and start one trading thread per pair.
+    """
+    for pair in pairs:
+        get_buffer(pair)
 
-    pair_threads = []
+    data_thread = threading.Thread(target=run_multiplexed, args=(pairs,))
+    data_thread.start()
+
+    trade_threads = []
     for pair in pairs:
-        t = threading.Thread(target=main, args=(pair,))
+        t = threading.Thread(target=start_trading_strategy, args=(pair,))
         t.start()
-        pair_threads.append(t)
+        trade_threads.append(t)
 
-    # Wait for all pair threads to complete (which they never will, so this keeps your program alive)
-    for t in pair_threads:
+    data_thread.join()
+    for t in trade_threads:
         t.join()
 
+if __name__ == "__main__":
+    performance_table_create()
+    # Pairs and the strategies trading them come from strategies.json (or STRATEGY_CONFIG)
+    pairs = configured_pairs(load_strategy_config())
+
+    # Fill each pair's buffer with recent history so the long moving averages are valid from the first bar
+    warm_start(pairs)
+
+    # Serve ingest, database, strategy and order metrics for Prometheus; METRICS_PORT=0 disables the endpoint
+    metrics_port = int(os.getenv('METRICS_PORT', '9100') or 0)
+    if metrics_port:
+        metrics.register_runtime_collectors()
+        metrics.register_gateway_collectors(order_gateway)
+        metrics.register_portfolio_collectors(portfolio)
+        metrics.start_http_server(metrics_port)
 
+    # INGEST_MODE=threads keeps the legacy one-WebSocket-per-pair data threads
+    if os.getenv('INGEST_MODE', 'multiplex') == 'multiplex':
+        main_multiplexed(pairs)
+    else:
+        pair_threads = []
+        for pair in pairs:
+            t = threading.Thread(target=main, args=(pair,))
+            t.start()
+            pair_threads.append(t)
 
+        # Wait for all pair threads to complete (which they never will, so this keeps your program alive)
+        for t in pair_threads:
+            t.join()
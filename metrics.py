@@ -0,0 +1,286 @@
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency buckets in seconds, from 10 microseconds to 10 seconds
+LATENCY_BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    """
+    A named metric with optional labels. `labels(*values)` returns the child for one label set;
+    hot paths look the child up once and keep it, so recording is a lock and an addition.
+
+    `set_function` instead computes the metric at scrape time from a value kept elsewhere,
+    returning a number or, for labelled metrics, a {label values: number} dict.
+    """
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._function = None
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def set_function(self, function):
+        self._function = function
+        return self
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self):
+        """
+        Yield (suffix, label names, label values, value) for every sample to export.
+        """
+        if self._function is not None:
+            result = self._function()
+            if isinstance(result, dict):
+                for values, value in result.items():
+                    yield '', self.labelnames, values if isinstance(values, tuple) else (values,), value
+            else:
+                yield '', self.labelnames, (), result
+            return
+        for values, child in list(self._children.items()):
+            yield '', self.labelnames, values, child.value
+
+class _Value:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value):
+        self.labels().set(value)
+
+class _HistogramValue:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def time(self):
+        return _Timer(self)
+
+class _Timer:
+    """
+    Context manager observing the elapsed time of its block.
+    """
+
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, registry=None):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.bounds)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def samples(self):
+        names = self.labelnames + ('le',)
+        for values, child in list(self._children.items()):
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float('inf'),), counts):
+                cumulative += count
+                yield '_bucket', names, values + (_format_value(bound),), cumulative
+            yield '_sum', self.labelnames, values, total
+            yield '_count', self.labelnames, values, cumulative
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self.metrics.append(metric)
+
+    def render(self):
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        for metric in list(self.metrics):
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                print(f"Error collecting metric {metric.name}: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, names, values, value in samples:
+                lines.append(f"{metric.name}{suffix}{_format_labels(names, values)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+def render():
+    return REGISTRY.render()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes every few seconds would otherwise flood the console
+
+def start_http_server(port, host=''):
+    """
+    Serve /metrics on a background thread, for runtimes without the Flask app. Returns the server.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"Serving metrics on http://{host or '0.0.0.0'}:{server.server_address[1]}/metrics")
+    return server
+
+# Metrics recorded on the hot paths; values kept elsewhere are exported at scrape time (see register_runtime_collectors)
+tick_seconds = Histogram('tradebot_tick_processing_seconds', "Time to apply one ticker payload to bars, candles and the archive.", ['pair'])
+websocket_reconnects = Counter('tradebot_websocket_reconnects_total', "WebSocket reconnections.", ['mode'])
+db_batch_seconds = Histogram('tradebot_db_batch_seconds', "Time to write and commit one batch on the database writer thread.")
+db_batch_items = Histogram('tradebot_db_batch_items', "Queued items committed per database writer batch.", buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000))
+db_write_errors = Counter('tradebot_db_write_errors_total', "Database writes that failed after being retried alone.")
+strategy_wakeup_lag = Histogram('tradebot_strategy_wakeup_lag_seconds', "Time from a bar being published to the strategy loop picking it up.", ['pair'])
+strategy_decision_seconds = Histogram('tradebot_strategy_decision_seconds', "Time to update the indicators and evaluate every strategy for new bars.", ['pair'])
+signals = Counter('tradebot_signals_total', "Buy and sell signals raised by strategies.", ['pair', 'strategy', 'side'])
+order_round_trip = Histogram('tradebot_order_round_trip_seconds', "Time from an order being submitted to the exchange response.", ['side', 'result'])
+trades_recorded = Counter('tradebot_trades_recorded_total', "Closed trades recorded in bot_performance.", ['pair'])
+
+_collectors_registered = set()
+
+def register_runtime_collectors():
+    """
+    Export what the ingest runtime already keeps (ingest stats, buffers, the writer queue) at scrape time,
+    so it costs nothing on the hot path. Safe to call more than once.
+    """
+    if 'runtime' in _collectors_registered:
+        return
+    _collectors_registered.add('runtime')
+    from data_request import get_ingest_stats
+    from price_buffer import buffers
+    from storage import database_writer
+
+    def ingest(field, scale=1):
+        return lambda: {(pair,): stats[field] * scale for pair, stats in get_ingest_stats().items()}
+
+    for field, documentation in (('messages', "Ticker payloads received."), ('bars', "Bars closed and published."),
+                                 ('late', "Payloads dropped because their bar had already closed."),
+                                 ('stale', "Payloads dropped because a newer one was already applied."),
+                                 ('malformed', "Payloads without a usable price or event time.")):
+        Counter(f'tradebot_ingest_{field}_total', documentation, ['pair']).set_function(ingest(field))
+    Gauge('tradebot_ingest_lag_seconds', "Receive time minus exchange event time of the latest payload.", ['pair']).set_function(ingest('last_lag_ms', 0.001))
+
+    def last_bar_age():
+        now = time.time()
+        return {(pair,): now - buffer.last_append for pair, buffer in buffers().items() if buffer.last_append}
+
+    Gauge('tradebot_last_bar_age_seconds', "Seconds since the pair's latest bar was published.", ['pair']).set_function(last_bar_age)
+    Gauge('tradebot_db_queue_depth', "Items waiting for the database writer thread.").set_function(database_writer.queue.qsize)
+
+def register_gateway_collectors(gateway):
+    """
+    Export an OrderGateway's queue depth and order counters at scrape time. Safe to call more than once.
+    """
+    if 'gateway' in _collectors_registered:
+        return
+    _collectors_registered.add('gateway')
+    Gauge('tradebot_orders_in_queue', "Orders waiting for a gateway worker.").set_function(gateway.queue.qsize)
+    Counter('tradebot_orders_submitted_total', "Orders submitted to the gateway.").set_function(lambda: gateway.submitted)
+    Counter('tradebot_orders_filled_total', "Orders the exchange accepted.").set_function(lambda: gateway.filled)
+    Counter('tradebot_orders_failed_total', "Orders that failed.").set_function(lambda: gateway.failed)
+
+def register_portfolio_collectors(portfolio):
+    """
+    Export a Portfolio's exposure per pair and in total from its current snapshot at scrape time.
+    """
+    if 'portfolio' in _collectors_registered:
+        return
+    _collectors_registered.add('portfolio')
+
+    def exposure():
+        state = portfolio.snapshot()
+        return {(pair,): float(state.open_notional[i] + state.reserved[i]) for pair, i in state.index.items()}
+
+    Gauge('tradebot_portfolio_exposure', "Notional held at cost plus notional reserved for BUY orders in flight.", ['pair']).set_function(exposure)
+    Gauge('tradebot_portfolio_total_exposure', "Exposure summed over every pair.").set_function(lambda: portfolio.snapshot().total_exposure)
+    Gauge('tradebot_portfolio_max_exposure', "Global exposure cap.").set_function(lambda: portfolio.max_exposure)
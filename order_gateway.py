@@ -0,0 +1,241 @@
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from binance.client import Client
+from price_buffer import get_buffer
+import metrics
+
+class RateLimiter:
+    """
+    Tracks request weight used in the exchange's one-minute window.
+
+    The local estimate is bumped before every request and corrected from the
+    X-MBX-USED-WEIGHT-1M header the exchange returns. Callers block until the next
+    window once the budget is spent instead of getting the API key banned.
+    """
+
+    def __init__(self, limit=1200, window=60, headroom=0.9):
+        self.limit = int(limit * headroom)
+        self.window = window
+        self.used = 0
+        self._window_start = self._current_window()
+        self._lock = threading.Lock()
+
+    def _current_window(self):
+        return time.time() // self.window * self.window
+
+    def acquire(self, weight=1):
+        while True:
+            with self._lock:
+                window_start = self._current_window()
+                if window_start != self._window_start:
+                    self._window_start = window_start
+                    self.used = 0
+                if self.used + weight <= self.limit:
+                    self.used += weight
+                    return
+                wait = self._window_start + self.window - time.time()
+            print(f"Request weight budget spent ({self.used}/{self.limit}); waiting {wait:.1f}s")
+            time.sleep(max(wait, 0.01))
+
+    def update(self, used_weight):
+        """
+        Sync with the weight the exchange reports for the current window.
+        """
+        with self._lock:
+            if used_weight > self.used:
+                self.used = used_weight
+
+class BinanceExchange:
+    """
+    Places market orders through python-binance.
+    Each gateway worker gets its own client, so its HTTP session stays open and is reused for every order.
+    """
+
+    def __init__(self, api_key, api_secret, testnet=True):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.testnet = testnet
+        self._local = threading.local()
+
+    def _client(self):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = Client(self.api_key, self.api_secret, testnet=self.testnet, ping=False)
+            self._local.client = client
+        return client
+
+    def market_order(self, pair, side, quantity):
+        """
+        Send a market order and return (order, used weight reported by the exchange or None).
+        """
+        client = self._client()
+        if side == 'BUY':
+            order = client.order_market_buy(symbol=pair, quantity=quantity)
+        else:
+            order = client.order_market_sell(symbol=pair, quantity=quantity)
+        used_weight = client.response.headers.get('x-mbx-used-weight-1m')
+        return order, int(used_weight) if used_weight is not None else None
+
+class MockExchange:
+    """
+    Local stand-in that fills market orders at the latest streamed price after a configurable delay,
+    for throughput and latency tests without the network.
+
+    It also answers the two client calls the strategy makes (exchange info and symbol ticker),
+    so it can stand in for the Binance client as well and run fully offline.
+    """
+
+    def __init__(self, latency=0.0, price_source=None, commission_rate=0.001, symbols=(), lot_size=('0.00001', '0.00001')):
+        """
+        Parameters:
+        latency (float): Seconds each order takes to "reach the exchange".
+        price_source (callable): Maps a pair to its fill price; defaults to the pair's latest tick.
+        symbols (iterable): Pairs listed in the mock exchange info.
+        lot_size (tuple): (minQty, stepSize) of the LOT_SIZE filter given to every listed pair.
+        """
+        self.latency = latency
+        self.price_source = price_source or (lambda pair: get_buffer(pair).last_tick[0])
+        self.commission_rate = commission_rate
+        self.symbols = [symbol.upper() for symbol in symbols]
+        self.lot_size = lot_size
+        self.orders = []
+        self._order_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def market_order(self, pair, side, quantity):
+        if self.latency:
+            time.sleep(self.latency)
+        price = self.price_source(pair)
+        if price is None:
+            raise ValueError(f"No price available to fill {side} {quantity} {pair}.")
+        order = {
+            'symbol': pair,
+            'orderId': next(self._order_ids),
+            'transactTime': int(time.time() * 1000),
+            'side': side,
+            'type': 'MARKET',
+            'status': 'FILLED',
+            'origQty': str(quantity),
+            'executedQty': str(quantity),
+            'fills': [{
+                'price': str(price),
+                'qty': str(quantity),
+                'commission': str(price * quantity * self.commission_rate),
+                'commissionAsset': 'USDT',
+            }],
+        }
+        with self._lock:
+            self.orders.append(order)
+        return order, None
+
+    def get_exchange_info(self):
+        min_quantity, step_size = self.lot_size
+        return {'symbols': [
+            {'symbol': symbol, 'filters': [{'filterType': 'LOT_SIZE', 'minQty': min_quantity, 'stepSize': step_size}]}
+            for symbol in self.symbols
+        ]}
+
+    def get_symbol_ticker(self, symbol):
+        price = self.price_source(symbol)
+        if price is None:
+            raise ValueError(f"No price available for {symbol}.")
+        return {'symbol': symbol, 'price': str(price)}
+
+class OrderIntent:
+    """
+    A request to buy or sell, queued for the gateway workers.
+    """
+
+    def __init__(self, pair, side, quantity, future, callback=None):
+        self.pair = pair
+        self.side = side
+        self.quantity = quantity
+        self.future = future
+        self.callback = callback
+        self.created_at = time.perf_counter()
+
+class OrderGateway:
+    """
+    Accepts order intents on a queue and submits them on a small pool of worker threads,
+    so a slow exchange response never stalls a pair's strategy loop.
+
+    `submit` returns a Future that resolves to the exchange's order response.
+    """
+
+    def __init__(self, exchange, workers=4, rate_limiter=None, order_weight=1):
+        self.exchange = exchange
+        self.workers = workers
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.order_weight = order_weight
+        self.queue = queue.Queue()
+        self.submitted = 0
+        self.filled = 0
+        self.failed = 0
+        self.last_latency = None  # Seconds from submit to exchange response
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if not self._threads:
+                for i in range(self.workers):
+                    t = threading.Thread(target=self._run, name=f"order-gateway-{i}", daemon=True)
+                    t.start()
+                    self._threads.append(t)
+
+    def submit(self, pair, side, quantity, callback=None):
+        """
+        Queue a market order and return a Future for the order response.
+        `callback(intent, order, error)` is also invoked from the worker thread once it completes.
+        """
+        future = Future()
+        self.queue.put(OrderIntent(pair, side, quantity, future, callback))
+        with self._lock:
+            self.submitted += 1
+        return future
+
+    def _run(self):
+        while True:
+            intent = self.queue.get()
+            if intent is None:
+                break
+            if not intent.future.set_running_or_notify_cancel():
+                continue
+            order = error = None
+            try:
+                self.rate_limiter.acquire(self.order_weight)
+                order, used_weight = self.exchange.market_order(intent.pair, intent.side, intent.quantity)
+                if used_weight is not None:
+                    self.rate_limiter.update(used_weight)
+            except Exception as e:
+                error = e
+
+            latency = time.perf_counter() - intent.created_at
+            metrics.order_round_trip.labels(intent.side, 'filled' if error is None else 'failed').observe(latency)
+            with self._lock:
+                self.last_latency = latency
+                if error is None:
+                    self.filled += 1
+                else:
+                    self.failed += 1
+
+            if error is None:
+                intent.future.set_result(order)
+            else:
+                intent.future.set_exception(error)
+            if intent.callback is not None:
+                try:
+                    intent.callback(intent, order, error)
+                except Exception as e:
+                    print(f"Error in order callback for {intent.pair}: {e}")
+
+    def stop(self):
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self.queue.put(None)
+        for t in threads:
+            t.join()
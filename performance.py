@@ -1,13 +1,21 @@
 #!/usr/bin/env python
 # coding: utf-8
 
+import threading
 import pandas as pd
-import sqlalchemy
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from datetime import datetime
+from storage import engine, database_writer
+from analytics import risk_analytics
+import metrics
 
-# Initialize the database engine
-engine = create_engine('sqlite:///TradingData.db')
+COMMISSION_RATE = 0.001  # Commission rate of 0.1% per side
+
+def trade_profit_loss(entry_price, exit_price, quantity, commission_rate=COMMISSION_RATE):
+    """
+    Net profit or loss of a round trip after commission on both sides. Works on scalars and NumPy arrays.
+    """
+    return (exit_price - entry_price) * quantity - (entry_price + exit_price) * quantity * commission_rate
 
 def create_performance_table(engine):
     with engine.connect() as conn:
@@ -32,84 +40,212 @@ def create_performance_table(engine):
         );
         """)
         conn.execute(query)
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_bot_performance_timestamp ON bot_performance (timestamp);"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_bot_performance_pair ON bot_performance (pair, id);"))
+        conn.commit()
         print("Performance table is ready.")
 
+class RunningTotals:
+    """
+    Cumulative trade statistics for one scope (all pairs or a single pair).
+    """
+
+    def __init__(self, trade_count=0, win_count=0, total_profit_loss=0.0, total_money_invested=0.0, total_profit=0.0):
+        self.trade_count = trade_count
+        self.win_count = win_count
+        self.total_profit_loss = total_profit_loss
+        self.total_money_invested = total_money_invested
+        self.total_profit = total_profit
+
+    @property
+    def loss_count(self):
+        return self.trade_count - self.win_count
+
+    @property
+    def win_rate(self):
+        return self.win_count / self.trade_count if self.trade_count else None
+
+    @property
+    def cumulative_pct_change(self):
+        return self.total_profit / self.total_money_invested * 100 if self.total_money_invested else 0.0
+
+    def add(self, profit_loss, invested):
+        self.trade_count += 1
+        self.win_count += 1 if profit_loss > 0 else 0
+        self.total_profit_loss += profit_loss
+        self.total_money_invested += invested
+        self.total_profit += profit_loss
+
+    def as_dict(self):
+        return {
+            'trade_count': self.trade_count,
+            'win_count': self.win_count,
+            'loss_count': self.loss_count,
+            'win_rate': self.win_rate,
+            'total_profit_loss': self.total_profit_loss,
+            'total_money_invested': self.total_money_invested,
+            'total_profit': self.total_profit,
+            'cumulative_pct_change': self.cumulative_pct_change,
+        }
+
+class PerformanceAccumulator:
+    """
+    Running performance totals kept in memory, overall and per pair.
+
+    Seeded once from bot_performance at startup, then updated under a lock as each trade
+    closes, so concurrent pair threads never read the same totals. Rows are persisted
+    asynchronously through the shared database writer. Under the supervisor each worker process
+    has its own accumulator, covering the seed plus the trades that process closed.
+    """
+
+    def __init__(self):
+        self.overall = RunningTotals()
+        self.pairs = {}
+        self.seeded = False
+        self._lock = threading.Lock()
+
+    def seed(self, engine):
+        """
+        Load the running totals from the table: overall from the latest row, per pair in one grouped query.
+        """
+        # Each row's invested amount is the step in the cumulative total_money_invested column
+        per_pair_query = text("""
+        SELECT pair,
+               COUNT(*) AS trade_count,
+               SUM(CASE WHEN profit_loss > 0 THEN 1 ELSE 0 END) AS win_count,
+               SUM(profit_loss) AS total_profit_loss,
+               SUM(invested) AS total_money_invested
+        FROM (
+            SELECT pair, profit_loss,
+                   total_money_invested - LAG(total_money_invested, 1, 0) OVER (ORDER BY id) AS invested
+            FROM bot_performance
+        )
+        GROUP BY pair;
+        """)
+        with engine.connect() as conn:
+            last_row = read_latest_row(conn)
+            pair_rows = conn.execute(per_pair_query).fetchall()
+
+        with self._lock:
+            if last_row is None:
+                self.overall = RunningTotals()
+            else:
+                self.overall = RunningTotals(
+                    int(last_row['trade_count']), int(last_row['win_count']), float(last_row['total_profit_loss']),
+                    float(last_row['total_money_invested']), float(last_row['total_profit'])
+                )
+            self.pairs = {
+                row.pair: RunningTotals(row.trade_count, row.win_count, row.total_profit_loss or 0.0,
+                                        row.total_money_invested or 0.0, row.total_profit_loss or 0.0)
+                for row in pair_rows
+            }
+            self.seeded = True
+
+    def ensure_seeded(self, engine):
+        if not self.seeded:
+            self.seed(engine)
+
+    def record(self, pair, entry_price, exit_price, quantity, commission_rate=COMMISSION_RATE):
+        """
+        Apply a closed trade and return the overall totals as they stand after it.
+        """
+        profit_loss = trade_profit_loss(entry_price, exit_price, quantity, commission_rate)
+        invested = entry_price * quantity
+        with self._lock:
+            self.overall.add(profit_loss, invested)
+            pair_totals = self.pairs.get(pair)
+            if pair_totals is None:
+                pair_totals = self.pairs[pair] = RunningTotals()
+            pair_totals.add(profit_loss, invested)
+            return profit_loss, self.overall.as_dict()
+
+    def snapshot(self, pair=None):
+        """
+        Return a copy of the overall totals, or of one pair's totals (None if it has no trades).
+        """
+        with self._lock:
+            totals = self.overall if pair is None else self.pairs.get(pair)
+            return totals.as_dict() if totals is not None else None
+
+performance_accumulator = PerformanceAccumulator()
+
+def read_latest_row(conn):
+    query = text("""
+    SELECT * FROM bot_performance
+    ORDER BY id DESC
+    LIMIT 1;
+    """)
+    result = conn.execute(query).fetchone()
+    if result:
+        return pd.Series(dict(result._mapping))
+    return None
+
 def get_latest_row(engine):
     with engine.connect() as conn:
-        query = text("""
-        SELECT * FROM bot_performance
-        ORDER BY id DESC
-        LIMIT 1;
-        """)
-        result = conn.execute(query).fetchone()
-        if result:
-            inspector = sqlalchemy.inspect(engine)
-            columns = [col['name'] for col in inspector.get_columns('bot_performance')]
-            return pd.Series(result, index=columns)
-        return None
+        return read_latest_row(conn)
+
+# The cumulative columns are computed from the latest row inside the insert, so they stay consistent
+# when several worker processes record trades into the same table: SQLite runs one writer at a time
+insert_performance_query = text("""
+INSERT INTO bot_performance (timestamp, pair, entry_price, exit_price, profit_loss, total_profit_loss, trade_count, win_count, loss_count, pct_change, cumulative_pct_change, trade_duration, commission_rate, total_money_invested, total_profit)
+SELECT DATETIME(CURRENT_TIMESTAMP, '+7 hours'), :pair, :entry_price, :exit_price, :profit_loss, total_profit_loss, trade_count, win_count, trade_count - win_count, :pct_change,
+       CASE WHEN total_money_invested THEN total_profit / total_money_invested * 100 ELSE 0 END, :trade_duration, :commission_rate, total_money_invested, total_profit
+FROM (
+    SELECT COALESCE(latest.total_profit_loss, 0) + :profit_loss AS total_profit_loss,
+           COALESCE(latest.trade_count, 0) + 1 AS trade_count,
+           COALESCE(latest.win_count, 0) + (CASE WHEN :profit_loss > 0 THEN 1 ELSE 0 END) AS win_count,
+           COALESCE(latest.total_money_invested, 0) + :invested AS total_money_invested,
+           COALESCE(latest.total_profit, 0) + :profit_loss AS total_profit
+    FROM (SELECT 1) LEFT JOIN (SELECT * FROM bot_performance ORDER BY id DESC LIMIT 1) AS latest ON 1
+);
+""")
 
 def insert_performance_record(engine, **kwargs):
-    with engine.connect() as conn:
-        query = text("""
-        INSERT INTO bot_performance (timestamp, pair, entry_price, exit_price, profit_loss, total_profit_loss, trade_count, win_count, loss_count, pct_change, cumulative_pct_change, trade_duration, commission_rate, total_money_invested, total_profit)
-        VALUES (DATETIME(CURRENT_TIMESTAMP, '+7 hours'), :pair, :entry_price, :exit_price, :profit_loss, :total_profit_loss, :trade_count, :win_count, :loss_count, :pct_change, :cumulative_pct_change, :trade_duration, :commission_rate, :total_money_invested, :total_profit);
-        """)
-        conn.execute(query, kwargs)
-        conn.commit()
-        print(f"Performance data for {kwargs['pair']} inserted successfully.")
+    """
+    Queue a performance row on the shared database writer.
+    """
+    database_writer.execute(insert_performance_query, kwargs)
+    print(f"Performance data for {kwargs['pair']} queued for insert.")
 
 def insert_trade_performance(engine, pair, entry_time, entry_price, current_price, quantity):
-    commission_rate = 0.001  # Set commission rate to 0.1%
+    """
+    Record a closed trade: update the in-memory running totals and queue the row for the database.
+    The row's cumulative columns are computed by the database, across every process writing to it.
+    """
+    performance_accumulator.ensure_seeded(engine)
+    commission_rate = COMMISSION_RATE
     exit_price = current_price
-    profit_loss = (current_price - entry_price) * quantity - (entry_price + current_price) * quantity * commission_rate
+    profit_loss, _ = performance_accumulator.record(pair, entry_price, current_price, quantity, commission_rate)
     pct_change = (current_price - entry_price) / entry_price * 100
-    last_row = get_latest_row(engine)
-
-    if last_row is None:
-        total_profit_loss = profit_loss
-        trade_count = 1
-        win_count = 1 if profit_loss > 0 else 0
-        loss_count = 1 - win_count
-        total_money_invested = entry_price * quantity
-        total_profit = profit_loss
-    else:
-        total_profit_loss = last_row['total_profit_loss'] + profit_loss
-        trade_count = last_row['trade_count'] + 1
-        win_count = last_row['win_count'] + (1 if profit_loss > 0 else 0)
-        loss_count = trade_count - win_count
-        total_money_invested = last_row['total_money_invested'] + entry_price * quantity
-        total_profit = last_row['total_profit'] + profit_loss
-
-    cumulative_pct_change = (total_profit / total_money_invested) * 100
 
     current_time = datetime.now().replace(second=0, microsecond=0)
     trade_duration = (current_time - entry_time).total_seconds() / 60
 
-    insert_performance_record(engine, pair=pair, entry_price=entry_price, exit_price=exit_price, profit_loss=profit_loss, total_profit_loss=total_profit_loss, trade_count=trade_count, win_count=win_count, loss_count=loss_count, pct_change=pct_change, cumulative_pct_change=cumulative_pct_change, trade_duration=trade_duration, commission_rate=commission_rate, total_money_invested=total_money_invested, total_profit=total_profit)
+    risk_analytics.update(pair, profit_loss, pct_change, trade_duration)
+    metrics.trades_recorded.labels(pair).inc()
 
-def get_total_profit_loss(engine):
-    query = text("""
-    SELECT total_profit_loss
-    FROM bot_performance
-    ORDER BY id DESC
-    LIMIT 1;
-    """)
-    with engine.connect() as conn:
-        result = conn.execute(query).fetchone()
-        return result[0] if result else None
+    insert_performance_record(engine, pair=pair, entry_price=entry_price, exit_price=exit_price, profit_loss=profit_loss, invested=entry_price * quantity, pct_change=pct_change, trade_duration=trade_duration, commission_rate=commission_rate)
 
-def get_win_rate(engine):
-    query = text("""
-    SELECT (win_count * 1.0) / (trade_count * 1.0) AS win_rate
-    FROM bot_performance
-    ORDER BY timestamp DESC
-    LIMIT 1;
-    """)
-    with engine.connect() as conn:
-        return conn.execute(query).scalar()
+def get_total_profit_loss(engine=engine):
+    """
+    Total profit/loss across all trades, answered from the in-memory totals.
+    """
+    performance_accumulator.ensure_seeded(engine)
+    totals = performance_accumulator.snapshot()
+    return totals['total_profit_loss'] if totals['trade_count'] else None
+
+def get_win_rate(engine=engine):
+    """
+    Fraction of winning trades, answered from the in-memory totals.
+    """
+    performance_accumulator.ensure_seeded(engine)
+    return performance_accumulator.snapshot()['win_rate']
 
 def performance_table_create():
     create_performance_table(engine)
+    performance_accumulator.seed(engine)
+    risk_analytics.rebuild(engine)
+    database_writer.start()
 
 if __name__ == "__main__":
     performance_table_create()
\ No newline at end of file
@@ -0,0 +1,170 @@
+import os
+import threading
+import numpy as np
+
+class PortfolioSnapshot:
+    """
+    Immutable view of every pair's position: quantity held, notional at cost, notional reserved for
+    BUY orders in flight, and the pair's exposure cap. Replaced as a whole on every change.
+    """
+
+    __slots__ = ('version', 'index', 'quantity', 'open_notional', 'reserved', 'caps', 'total_exposure')
+
+    def __init__(self, version, index, quantity, open_notional, reserved, caps):
+        self.version = version
+        self.index = index  # Pair -> slot in the arrays
+        self.quantity = quantity
+        self.open_notional = open_notional
+        self.reserved = reserved
+        self.caps = caps
+        for array in (quantity, open_notional, reserved, caps):
+            array.flags.writeable = False
+        self.total_exposure = float(open_notional.sum() + reserved.sum())
+
+    def exposure(self, pair):
+        i = self.index.get(pair.upper())
+        return 0.0 if i is None else float(self.open_notional[i] + self.reserved[i])
+
+    def as_dict(self):
+        return {pair: {'quantity': float(self.quantity[i]), 'open_notional': float(self.open_notional[i]),
+                       'reserved': float(self.reserved[i]), 'cap': float(self.caps[i])}
+                for pair, i in self.index.items()}
+
+class Portfolio:
+    """
+    Capital at risk across every pair, with a global and a per-pair exposure cap (notional in the quote currency, at cost).
+
+    Reads never lock: the state is an immutable PortfolioSnapshot swapped in by reference, so `headroom`
+    and `snapshot` cost a few microseconds however many trade threads call them. Only changes (allocations,
+    fills, releases) take the writers' lock, for as long as it takes to build the next snapshot from small arrays.
+
+    `allocate` sizes every BUY signal raised on a bar in one vectorized pass: each pair's requests are scaled
+    down to its remaining cap, then all of them to the remaining global cap, and what is granted is reserved
+    until the order fills (`on_fill`) or fails (`release`).
+    """
+
+    def __init__(self, max_exposure, max_pair_exposure, min_notional=10.0):
+        self.max_exposure = max_exposure
+        self.max_pair_exposure = max_pair_exposure
+        self.min_notional = min_notional  # Grants below this are dropped rather than placed as dust orders
+        self.pair_limits = {}  # Per-pair caps overriding max_pair_exposure
+        self._lock = threading.Lock()
+        empty = np.zeros(0)
+        self._state = PortfolioSnapshot(0, {}, empty.copy(), empty.copy(), empty.copy(), empty.copy())
+
+    def snapshot(self):
+        return self._state
+
+    def headroom(self, pair):
+        """
+        Notional the pair can still take on under both caps, read without locking.
+        """
+        pair = pair.upper()
+        state = self._state
+        i = state.index.get(pair)
+        pair_room = self.pair_limits.get(pair, self.max_pair_exposure) if i is None else state.caps[i] - state.open_notional[i] - state.reserved[i]
+        return max(0.0, min(float(pair_room), self.max_exposure - state.total_exposure))
+
+    def set_limits(self, max_exposure=None, max_pair_exposure=None):
+        with self._lock:
+            if max_exposure is not None:
+                self.max_exposure = max_exposure
+            if max_pair_exposure is not None:
+                self.max_pair_exposure = max_pair_exposure
+            self._publish_caps(self._state)
+
+    def set_pair_limit(self, pair, cap):
+        """
+        Override the per-pair cap for one pair.
+        """
+        with self._lock:
+            self.pair_limits[pair.upper()] = cap
+            self._publish_caps(self._with_pairs([pair]))
+
+    def _caps(self, pairs):
+        return np.array([self.pair_limits.get(pair, self.max_pair_exposure) for pair in pairs], dtype=np.float64)
+
+    def _publish_caps(self, state):
+        self._publish(state, state.index, state.quantity, state.open_notional, state.reserved, self._caps(state.index))
+
+    def allocate(self, pairs, notionals):
+        """
+        Grant capital to concurrent BUY signals, one entry per signal. Returns the granted notionals
+        (0 where the caps leave less than `min_notional`), already reserved against the caps.
+        """
+        notionals = np.asarray(notionals, dtype=np.float64)
+        with self._lock:
+            state = self._with_pairs(pairs)
+            idx = np.fromiter((state.index[pair.upper()] for pair in pairs), dtype=np.intp, count=len(notionals))
+            n = len(state.index)
+            pair_room = np.maximum(state.caps - state.open_notional - state.reserved, 0.0)
+            requested = np.bincount(idx, weights=notionals, minlength=n)
+            pair_scale = np.minimum(1.0, pair_room / np.where(requested > 0, requested, 1.0))
+            grants = notionals * pair_scale[idx]
+            global_room = max(self.max_exposure - state.total_exposure, 0.0)
+            total = grants.sum()
+            if total > global_room:
+                grants *= global_room / total
+            grants[grants < self.min_notional] = 0.0
+            reserved = state.reserved + np.bincount(idx, weights=grants, minlength=n)
+            self._publish(state, state.index, state.quantity, state.open_notional, reserved, state.caps)
+        return grants
+
+    def release(self, pair, notional):
+        """
+        Return capital reserved by `allocate` that will not be spent, e.g. when the order failed.
+        """
+        self._apply(pair, None, 0.0, 0.0, notional)
+
+    def on_fill(self, pair, side, quantity, price, reserved=0.0):
+        """
+        Record a filled order. A BUY replaces its reservation with the notional actually bought; a SELL
+        reduces the position and its cost proportionally. Also used to register positions restored at startup.
+        """
+        self._apply(pair, side, quantity, price, reserved)
+
+    def _apply(self, pair, side, quantity, price, reserved):
+        with self._lock:
+            state = self._with_pairs([pair])
+            i = state.index[pair.upper()]
+            quantities, open_notional, reservations = state.quantity.copy(), state.open_notional.copy(), state.reserved.copy()
+            reservations[i] = max(reservations[i] - reserved, 0.0)
+            if side == 'BUY':
+                quantities[i] += quantity
+                open_notional[i] += quantity * price
+            elif side == 'SELL':
+                held = quantities[i]
+                sold = min(quantity, held)
+                open_notional[i] = open_notional[i] * (held - sold) / held if held > 0 else 0.0
+                quantities[i] = held - sold
+            self._publish(state, state.index, quantities, open_notional, reservations, state.caps)
+
+    def _with_pairs(self, pairs):
+        """
+        The current state, grown to include any pair it has not seen yet. Called with the lock held.
+        """
+        state = self._state
+        new = [pair for pair in dict.fromkeys(pair.upper() for pair in pairs) if pair not in state.index]
+        if not new:
+            return state
+        index = dict(state.index)
+        for pair in new:
+            index[pair] = len(index)
+        grow = len(new)
+        return PortfolioSnapshot(
+            state.version, index,
+            np.concatenate([state.quantity, np.zeros(grow)]),
+            np.concatenate([state.open_notional, np.zeros(grow)]),
+            np.concatenate([state.reserved, np.zeros(grow)]),
+            np.concatenate([state.caps, self._caps(new)]))
+
+    def _publish(self, state, index, quantity, open_notional, reserved, caps):
+        self._state = PortfolioSnapshot(state.version + 1, index, quantity, open_notional, reserved, caps)
+
+# Caps on capital at risk, in the quote currency (USDT); each BUY signal asks for ORDER_NOTIONAL of it
+MAX_EXPOSURE = float(os.getenv('PORTFOLIO_MAX_EXPOSURE', 500))
+MAX_PAIR_EXPOSURE = float(os.getenv('PORTFOLIO_MAX_PAIR_EXPOSURE', 100))
+ORDER_NOTIONAL = float(os.getenv('PORTFOLIO_ORDER_NOTIONAL', 50))
+
+# The one portfolio every trade thread in the process shares
+portfolio = Portfolio(MAX_EXPOSURE, MAX_PAIR_EXPOSURE)
@@ -0,0 +1,145 @@
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+class PriceBuffer:
+    """
+    Fixed-size in-memory ring buffer of (timestamp, close) bars for one trading pair.
+
+    The data thread appends closed bars and the trade thread waits on the buffer's
+    condition variable, so a new bar wakes the strategy immediately instead of
+    being picked up by the next database poll.
+    """
+
+    def __init__(self, capacity=200):
+        self.capacity = capacity
+        self._timestamps = np.zeros(capacity, dtype='datetime64[ms]')
+        self._closes = np.full(capacity, np.nan, dtype=np.float64)
+        self._seq = 0  # Total number of bars ever appended
+        self._wakeups = 0  # Bumped by wake() to release waiters without a new bar
+        self.last_tick = (None, None)  # (price, event time in ms) of the latest tick, replaced atomically
+        self.last_append = None  # Wall-clock time the latest bar was appended
+        self._cond = threading.Condition()
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def __len__(self):
+        return min(self._seq, self.capacity)
+
+    def set_last_tick(self, price, event_time):
+        """
+        Record the latest traded price without waking the strategy; bars are what trigger it.
+        """
+        self.last_tick = (price, event_time)
+
+    def append(self, timestamp, close):
+        """
+        Append a closed bar, overwriting the oldest one when the buffer is full,
+        and wake every thread waiting for new data.
+        """
+        with self._cond:
+            head = self._seq % self.capacity
+            self._timestamps[head] = np.datetime64(timestamp, 'ms')
+            self._closes[head] = close
+            self._seq += 1
+            self.last_append = time.time()
+            self._cond.notify_all()
+
+    def extend(self, timestamps, closes):
+        """
+        Append several bars in chronological order with a single wakeup.
+        """
+        with self._cond:
+            for timestamp, close in zip(timestamps, closes):
+                head = self._seq % self.capacity
+                self._timestamps[head] = np.datetime64(timestamp, 'ms')
+                self._closes[head] = close
+                self._seq += 1
+            self.last_append = time.time()
+            self._cond.notify_all()
+
+    @property
+    def wakeups(self):
+        """
+        Number of `wake` calls so far, to pass to wait_for_bar.
+        """
+        return self._wakeups
+
+    def wait_for_bar(self, last_seq, timeout=None, wakeups=None):
+        """
+        Block until a bar newer than `last_seq` is appended, `wake` is called, or the timeout expires.
+        With `wakeups` (read from the property earlier), a `wake` since that read returns at once instead
+        of being missed. Returns the current sequence number.
+        """
+        with self._cond:
+            if wakeups is None:
+                wakeups = self._wakeups
+            self._cond.wait_for(lambda: self._seq > last_seq or self._wakeups != wakeups, timeout=timeout)
+            return self._seq
+
+    def wake(self):
+        """
+        Release threads blocked in wait_for_bar without appending a bar, e.g. when an order fills.
+        """
+        with self._cond:
+            self._wakeups += 1
+            self._cond.notify_all()
+
+    def latest(self, n=None):
+        """
+        Return copies of the last `n` timestamps and closes in chronological order.
+        """
+        with self._cond:
+            count = len(self) if n is None else min(n, len(self))
+            end = self._seq % self.capacity
+            idx = (np.arange(end - count, end)) % self.capacity
+            return self._timestamps[idx], self._closes[idx]
+
+    def since(self, seq):
+        """
+        Return the current sequence number together with the bars appended after sequence number `seq`
+        (at most one full buffer), read atomically so the caller can resume from exactly where this read ended.
+        """
+        with self._cond:
+            timestamps, closes = self.latest(self._seq - seq)
+            return self._seq, timestamps, closes
+
+    def snapshot(self):
+        """
+        Return the current sequence number together with every buffered bar, read atomically.
+        """
+        with self._cond:
+            timestamps, closes = self.latest()
+            return self._seq, timestamps, closes
+
+    def to_frame(self, n=None):
+        """
+        Return the last `n` bars as a DataFrame with 'timestamp' and 'close' columns.
+        """
+        timestamps, closes = self.latest(n)
+        return pd.DataFrame({'timestamp': timestamps, 'close': closes})
+
+_buffers = {}
+_buffers_lock = threading.Lock()
+
+def get_buffer(pair, capacity=200):
+    """
+    Return the shared price buffer for the given pair, creating it on first use.
+    """
+    key = pair.upper()
+    with _buffers_lock:
+        buffer = _buffers.get(key)
+        if buffer is None:
+            buffer = PriceBuffer(capacity)
+            _buffers[key] = buffer
+        return buffer
+
+def buffers():
+    """
+    Return every shared price buffer, keyed by symbol.
+    """
+    with _buffers_lock:
+        return dict(_buffers)
@@ -0,0 +1,116 @@
+import asyncio
+import json
+import threading
+from websockets.asyncio.server import serve
+from websockets.exceptions import ConnectionClosed
+
+def load_recording(path):
+    """
+    Load recorded ticker payloads from a JSON-lines file.
+    Lines may be raw ticker payloads or combined-stream frames ({"stream": ..., "data": ...}).
+    """
+    messages = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            message = json.loads(line)
+            messages.append(message.get("data", message))
+    return messages
+
+class ReplayServer:
+    """
+    Local stand-in for the Binance combined-stream endpoint.
+
+    Clients send a SUBSCRIBE request as they would to Binance, and the server replays the recorded
+    ticker payloads of the subscribed symbols wrapped in combined-stream frames.
+    """
+
+    def __init__(self, messages, host="127.0.0.1", port=0, speed=None):
+        """
+        Parameters:
+        messages (list): Ticker payloads in replay order; each needs at least 's' and 'c'.
+        speed (float): Replay speed relative to the recorded event times ('E'); None sends as fast as possible.
+        """
+        self.messages = messages
+        self.host = host
+        self.port = port
+        self.speed = speed
+        self.messages_sent = 0
+        self._loop = None
+        self._stop = None
+        self._ready = threading.Event()
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}/stream"
+
+    async def _handler(self, ws):
+        subscribed = set()
+        try:
+            request = json.loads(await ws.recv())
+            if request.get("method") == "SUBSCRIBE":
+                subscribed.update(request.get("params", []))
+            await ws.send(json.dumps({"result": None, "id": request.get("id")}))
+
+            last_event_time = None
+            for message in self.messages:
+                stream = f"{message['s'].lower()}@ticker"
+                if stream not in subscribed:
+                    continue
+                event_time = message.get("E")
+                if self.speed and event_time is not None and last_event_time is not None:
+                    delay = (event_time - last_event_time) / 1000 / self.speed
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                last_event_time = event_time
+                await ws.send(json.dumps({"stream": stream, "data": message}))
+                self.messages_sent += 1
+        except ConnectionClosed:
+            pass
+
+    async def _serve(self):
+        self._stop = asyncio.Event()
+        async with serve(self._handler, self.host, self.port) as server:
+            self.port = server.sockets[0].getsockname()[1]
+            self._ready.set()
+            await self._stop.wait()
+
+    def start(self):
+        """
+        Start serving on a background thread and return the combined-stream URL.
+        """
+        def target():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self._serve())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=target, name="replay-server", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self.url
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+            self._thread.join()
+
+def record(pairs, path, count=1000, url="wss://stream.binance.com:9443/stream"):
+    """
+    Record `count` live ticker payloads for the given pairs into a JSON-lines file for later replay.
+    """
+    from stream_client import MultiplexedStreamClient
+
+    recorded = []
+    with open(path, "w") as f:
+        def write(data):
+            f.write(json.dumps(data) + "\n")
+            recorded.append(data)
+            if len(recorded) >= count:
+                client.stop()
+
+        client = MultiplexedStreamClient({pair.upper(): write for pair in pairs}, url)
+        asyncio.run(client.run())
+    print(f"Recorded {len(recorded)} ticker messages to {path}")
@@ -0,0 +1,137 @@
+import json
+import os
+import threading
+import time
+
+# Bump when the layout of a saved state changes and add an upgrade from the previous version
+SNAPSHOT_VERSION = 2
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+STATE_DIR = os.getenv('STATE_DIR', os.path.join(basedir, 'state'))
+
+def upgrade_v1(state):
+    """
+    Version 1 held one MA-crossover position per pair with MA<n> indicators;
+    version 2 holds the state of each configured strategy and the pair's shared indicator cache.
+    """
+    position_keys = ('position', 'entry_price', 'highest_price', 'quantity', 'entry_stamp', 'pending_side')
+    return {
+        'last_bar': state['last_bar'],
+        'indicators': {f"SMA({name[2:]})": value for name, value in state['indicators'].items()},
+        'strategies': {'ma_crossover': {key: state[key] for key in position_keys}},
+    }
+
+# Upgrades from each older snapshot version to the next one
+UPGRADES = {1: upgrade_v1}
+
+class StateStore:
+    """
+    Crash-safe per-pair snapshots of live strategy state, one small JSON file per pair.
+
+    `save` only records the latest state in memory; a background thread writes it to a
+    temporary file, fsyncs it and renames it over the previous snapshot, so a crash leaves
+    either the old or the new snapshot on disk, never a torn one. Several saves between two
+    writes are coalesced into the newest.
+    """
+
+    def __init__(self, directory=STATE_DIR):
+        self.directory = directory
+        self.writes = 0
+        self._dirty = {}
+        self._writing = False
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def path(self, pair):
+        return os.path.join(self.directory, f"{pair.upper()}.json")
+
+    def start(self):
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="state-store", daemon=True)
+                self._thread.start()
+
+    def save(self, pair, state):
+        """
+        Queue `state` (JSON-serializable) as the pair's latest snapshot; never blocks on disk.
+        """
+        with self._cond:
+            self._dirty[pair.upper()] = state
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Block until every queued snapshot has been written. Returns False on timeout.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._dirty and not self._writing, timeout=timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._dirty)
+                pending, self._dirty = self._dirty, {}
+                self._writing = True
+            for pair, state in pending.items():
+                try:
+                    self._write(pair, state)
+                except Exception as e:
+                    print(f"Error saving state for {pair}: {e}")
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+    def _write(self, pair, state):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(pair)
+        tmp_path = path + '.tmp'
+        payload = {'version': SNAPSHOT_VERSION, 'pair': pair, 'saved_at': time.time(), 'state': state}
+        with open(tmp_path, 'w') as f:
+            json.dump(payload, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        # Persist the rename itself
+        dir_fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+        self.writes += 1
+
+    def load(self, pair):
+        """
+        Return the pair's last saved state, or None when there is no usable snapshot.
+        """
+        try:
+            with open(self.path(pair)) as f:
+                payload = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Error reading saved state for {pair}: {e}")
+            return None
+        version, state = payload.get('version'), payload['state']
+        while version in UPGRADES and version < SNAPSHOT_VERSION:
+            state = UPGRADES[version](state)
+            version += 1
+        if version != SNAPSHOT_VERSION:
+            print(f"Ignoring saved state for {pair}: snapshot version {payload.get('version')}, expected {SNAPSHOT_VERSION}")
+            return None
+        return state
+
+    def load_all(self):
+        """
+        Return the saved state of every pair with a snapshot, keyed by symbol.
+        """
+        if not os.path.isdir(self.directory):
+            return {}
+        states = {}
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                state = self.load(name[:-5])
+                if state is not None:
+                    states[name[:-5]] = state
+        return states
+
+state_store = StateStore()
@@ -0,0 +1,158 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import sqlalchemy
+from sqlalchemy import event
+from dotenv import load_dotenv
+import metrics
+
+# Load environment variables from .env file
+load_dotenv()
+basedir = os.path.abspath(os.path.dirname(__file__))
+db_url = os.getenv('DATABASE_URL', f"sqlite:///{os.path.join(basedir, 'TradingData.db')}")
+
+def configure_sqlite(dbapi_connection, connection_record):
+    """
+    Per-connection SQLite settings: WAL lets readers run alongside the writer,
+    and synchronous=NORMAL is durable enough for WAL without an fsync per commit.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL;")
+    cursor.execute("PRAGMA synchronous=NORMAL;")
+    cursor.execute("PRAGMA cache_size=-65536;")  # 64 MiB page cache
+    cursor.execute("PRAGMA temp_store=MEMORY;")
+    cursor.execute("PRAGMA busy_timeout=5000;")
+    cursor.close()
+
+def create_engine(url=db_url, pool_size=10):
+    """
+    Create an engine with pooled connections, applying the SQLite settings above when applicable.
+    """
+    engine = sqlalchemy.create_engine(url, pool_size=pool_size)
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine, 'connect', configure_sqlite)
+    return engine
+
+# The one engine every component shares
+engine = create_engine()
+
+class DatabaseWriter:
+    """
+    Single write-behind thread that owns every write this process makes to the database.
+
+    Components queue statements or callables and carry on; the writer drains whatever is
+    queued and commits it in one transaction, merging consecutive uses of the same statement
+    into one executemany. Readers use their own pooled connections and never wait on ingest.
+    """
+
+    def __init__(self, engine, max_batch=1000):
+        self.engine = engine
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        self.rollback_listeners = []  # Called after a failed batch so callers can drop cached state
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="database-writer", daemon=True)
+                self._thread.start()
+
+    def execute(self, statement, params=None):
+        """
+        Queue a statement with a dict of parameters (or a list of them) and return a Future.
+        """
+        future = Future()
+        self.queue.put((statement, params, future))
+        return future
+
+    def call(self, fn):
+        """
+        Queue `fn(conn)` to run inside the writer's transaction and return a Future for its result.
+        """
+        future = Future()
+        self.queue.put((fn, None, future))
+        return future
+
+    def flush(self, timeout=None):
+        """
+        Block until everything queued before this call has been committed.
+        """
+        return self.call(lambda conn: None).result(timeout)
+
+    def _drain(self):
+        items = [self.queue.get()]
+        while len(items) < self.max_batch:
+            try:
+                items.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    @staticmethod
+    def _apply(conn, items):
+        """
+        Run queued items on `conn`, merging consecutive single-row uses of a statement into one executemany.
+        Returns the result of each item in order.
+        """
+        results = []
+        i = 0
+        while i < len(items):
+            work, params, _ = items[i]
+            if callable(work):
+                results.append(work(conn))
+                i += 1
+                continue
+            rows = []
+            j = i
+            while j < len(items) and items[j][0] is work and isinstance(items[j][1], dict):
+                rows.append(items[j][1])
+                j += 1
+            if rows:
+                conn.execute(work, rows)
+                results.extend([None] * len(rows))
+                i = j
+            else:
+                conn.execute(work, params)
+                results.append(None)
+                i += 1
+        return results
+
+    def _run(self):
+        while True:
+            items = self._drain()
+            start = time.perf_counter()
+            try:
+                with self.engine.begin() as conn:
+                    results = self._apply(conn, items)
+            except Exception as e:
+                print(f"Error writing batch of {len(items)} items, retrying them one at a time: {e}")
+                self._notify_rollback()
+                for item in items:
+                    try:
+                        with self.engine.begin() as conn:
+                            result = self._apply(conn, [item])[0]
+                        item[2].set_result(result)
+                    except Exception as item_error:
+                        print(f"Error writing to the database: {item_error}")
+                        metrics.db_write_errors.inc()
+                        self._notify_rollback()
+                        item[2].set_exception(item_error)
+                continue
+            metrics.db_batch_seconds.observe(time.perf_counter() - start)
+            metrics.db_batch_items.observe(len(items))
+            for (_, _, future), result in zip(items, results):
+                future.set_result(result)
+
+    def _notify_rollback(self):
+        for listener in self.rollback_listeners:
+            try:
+                listener()
+            except Exception as e:
+                print(f"Error in rollback listener: {e}")
+
+# The one writer every component sends its writes to
+database_writer = DatabaseWriter(engine)
@@ -0,0 +1,242 @@
+import json
+import os
+import threading
+from datetime import datetime
+from indicators import SMA, EMA, RSI, IndicatorSet
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+STRATEGY_CONFIG = os.getenv('STRATEGY_CONFIG', os.path.join(basedir, 'strategies.json'))
+
+# Used when no configuration file exists: the original MA crossover on the original pairs
+DEFAULT_CONFIG = [{"strategy": "ma_crossover", "pairs": ["BTCUSDT", "ETHUSDT", "BNBUSDT"]}]
+
+INDICATORS = {'SMA': SMA, 'EMA': EMA, 'RSI': RSI}
+
+class IndicatorCache:
+    """
+    Every indicator any strategy on one pair needs, each computed once per bar.
+
+    Indicators are keyed by kind and parameters, so strategies asking for the same
+    `get('SMA', 20)` share one instance. Strategies should request their indicators
+    before the first update; one created later only sees the bars fed after it.
+    """
+
+    def __init__(self, pair):
+        self.pair = pair.upper()
+        self.indicators = IndicatorSet()
+
+    @staticmethod
+    def key(kind, *params):
+        return f"{kind}({','.join(str(p) for p in params)})"
+
+    def get(self, kind, *params):
+        key = self.key(kind, *params)
+        if key not in self.indicators:
+            self.indicators.add(key, INDICATORS[kind](*params))
+        return self.indicators[key]
+
+    def update_many(self, closes):
+        self.indicators.update_many(closes)
+
+    def __len__(self):
+        return len(self.indicators.indicators)
+
+    def get_state(self):
+        return self.indicators.get_state()
+
+    def set_state(self, state):
+        self.indicators.set_state(state)
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_indicator_cache(pair):
+    """
+    Return the shared indicator cache for the given pair, creating it on first use.
+    """
+    key = pair.upper()
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = IndicatorCache(key)
+        return _caches[key]
+
+def check_for_buy_signal(indicators, short='MA9', longs=('MA20', 'MA50', 'MA100')):
+    """
+    Check for a bullish crossover where the short MA crosses above any of the long MAs.
+
+    Parameters:
+    indicators: Anything with last_two(name), e.g. an IndicatorSet kept up to date by the strategy loop.
+    """
+    short_prev, short_curr = indicators.last_two(short)
+
+    for name in longs:
+        long_prev, long_curr = indicators.last_two(name)
+        if short_prev < long_prev and short_curr > long_curr:
+            return True
+
+    return False
+
+def check_for_sell_signal(current_price, entry_price, highest_price, take_profit=0.01, trailing_stop=0.013):
+    """
+    Check if the sell condition is met based on:
+    - Fall of `trailing_stop` (1.3%) from the highest price.
+    - `take_profit` (1%) profit target reached.
+    """
+    if current_price >= entry_price * (1 + take_profit):
+        print(f"Profit target reached: {take_profit:.1%} profit!")
+        return True
+
+    if current_price <= highest_price * (1 - trailing_stop):
+        print(f"Sell signal due to {trailing_stop:.1%} fall from highest price!")
+        return True
+
+    return False
+
+class Strategy:
+    """
+    Base class for a long-only strategy trading one pair, with its own position bookkeeping.
+
+    Subclasses take their indicators from the pair's shared IndicatorCache in __init__ and
+    implement should_enter/should_exit. The runner in execution.py feeds bars, places the
+    orders `on_bar` asks for and reports fills back through `on_fill`.
+    """
+
+    def __init__(self, name, pair, cache):
+        self.name = name
+        self.pair = pair.upper()
+        self.cache = cache
+        self.position = False
+        self.entry_price = None
+        self.highest_price = None
+        self.quantity = None
+        self.entry_stamp = None
+        self.pending_order = None  # Future of the order currently in flight, if any
+        self.pending_side = None
+        self.reserved = 0.0  # Portfolio capital reserved for the BUY order in flight
+
+    def should_enter(self, price):
+        raise NotImplementedError
+
+    def should_exit(self, price):
+        raise NotImplementedError
+
+    def on_bar(self, price):
+        """
+        Return 'BUY', 'SELL' or None for the latest close; nothing while an order is in flight.
+        """
+        if self.pending_order is not None:
+            return None
+        if not self.position:
+            return 'BUY' if self.should_enter(price) else None
+        self.highest_price = max(self.highest_price, price)
+        return 'SELL' if self.should_exit(price) else None
+
+    def on_fill(self, side, price):
+        if side == 'BUY':
+            self.position = True
+            self.entry_price = price
+            self.highest_price = price
+        else:
+            self.position = False
+
+    def get_state(self):
+        return {
+            'position': self.position,
+            'entry_price': self.entry_price,
+            'highest_price': self.highest_price,
+            'quantity': self.quantity,
+            'entry_stamp': self.entry_stamp.isoformat() if self.entry_stamp else None,
+            'pending_side': self.pending_side if self.pending_order is not None else None,
+        }
+
+    def set_state(self, state):
+        self.position = state['position']
+        self.entry_price = state['entry_price']
+        self.highest_price = state['highest_price']
+        self.quantity = state['quantity']
+        self.entry_stamp = datetime.fromisoformat(state['entry_stamp']) if state['entry_stamp'] else None
+
+class MACrossoverStrategy(Strategy):
+    """
+    Buy when the short SMA crosses above any long SMA; sell on a take-profit or trailing stop.
+    """
+
+    def __init__(self, name, pair, cache, short_window=9, long_windows=(20, 50, 100), take_profit=0.01, trailing_stop=0.013):
+        super().__init__(name, pair, cache)
+        self.take_profit = take_profit
+        self.trailing_stop = trailing_stop
+        self.short = IndicatorCache.key('SMA', short_window)
+        self.longs = [IndicatorCache.key('SMA', window) for window in long_windows]
+        cache.get('SMA', short_window)
+        for window in long_windows:
+            cache.get('SMA', window)
+
+    def should_enter(self, price):
+        return check_for_buy_signal(self.cache.indicators, self.short, self.longs)
+
+    def should_exit(self, price):
+        return check_for_sell_signal(price, self.entry_price, self.highest_price, self.take_profit, self.trailing_stop)
+
+class RSIReversionStrategy(Strategy):
+    """
+    Buy when RSI falls below `oversold`; sell when it rises above `overbought` or on a trailing stop.
+    """
+
+    def __init__(self, name, pair, cache, window=14, oversold=30, overbought=70, trailing_stop=0.013):
+        super().__init__(name, pair, cache)
+        self.rsi = cache.get('RSI', window)
+        self.oversold = oversold
+        self.overbought = overbought
+        self.trailing_stop = trailing_stop
+
+    def should_enter(self, price):
+        return self.rsi.value < self.oversold
+
+    def should_exit(self, price):
+        return self.rsi.value > self.overbought or price <= self.highest_price * (1 - self.trailing_stop)
+
+STRATEGIES = {'ma_crossover': MACrossoverStrategy, 'rsi_reversion': RSIReversionStrategy}
+
+def register_strategy(name, cls):
+    """
+    Make a Strategy subclass available to configuration files under `name`.
+    """
+    STRATEGIES[name] = cls
+
+def load_strategy_config(path=STRATEGY_CONFIG):
+    """
+    Load the list of configured strategies from a JSON file, or DEFAULT_CONFIG if it does not exist.
+
+    Each entry is {"strategy": <registered name>, "pairs": [...], "name": optional, "params": {...}}.
+    """
+    if not path or not os.path.exists(path):
+        return DEFAULT_CONFIG
+    with open(path) as f:
+        return json.load(f)
+
+def configured_pairs(config):
+    """
+    Every pair named in the configuration, in order of first appearance.
+    """
+    pairs = []
+    for entry in config:
+        for pair in entry['pairs']:
+            if pair.upper() not in pairs:
+                pairs.append(pair.upper())
+    return pairs
+
+def build_strategies(pair, cache, config):
+    """
+    Instantiate every configured strategy that trades `pair`, sharing `cache`.
+    """
+    strategies = []
+    names = set()
+    for entry in config:
+        if pair.upper() not in (p.upper() for p in entry['pairs']):
+            continue
+        name = entry.get('name', entry['strategy'])
+        if name in names:
+            raise ValueError(f"Duplicate strategy name {name} for {pair}")
+        names.add(name)
+        strategies.append(STRATEGIES[entry['strategy']](name, pair, cache, **entry.get('params', {})))
+    return strategies
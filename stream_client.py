@@ -0,0 +1,118 @@
+import asyncio
+import json
+import ssl
+import certifi
+from websockets.asyncio.client import connect
+from websockets.exceptions import WebSocketException
+import metrics
+
+BINANCE_STREAM_URL = "wss://stream.binance.com:9443/stream"
+
+class MultiplexedStreamClient:
+    """
+    Asyncio client that subscribes to the ticker streams of many pairs over a small pool of
+    combined-stream connections and dispatches each decoded payload to its pair's handler.
+
+    One event loop replaces the per-pair data threads, sockets and reconnect loops.
+    """
+
+    def __init__(self, handlers, url=BINANCE_STREAM_URL, streams_per_connection=200, reconnect_delay=5):
+        """
+        Parameters:
+        handlers (dict): Maps an upper-case symbol (e.g. 'BTCUSDT') to a callable taking the ticker payload.
+        url (str): Combined-stream endpoint; a local stand-in server can be used for testing.
+        streams_per_connection (int): Maximum number of pairs multiplexed over one connection.
+        reconnect_delay (float): Seconds to wait before reconnecting a dropped connection.
+        """
+        self.handlers = handlers
+        self.url = url
+        self.streams_per_connection = streams_per_connection
+        self.reconnect_delay = reconnect_delay
+        self.messages_received = 0
+        self.reconnects = 0
+        self._stopped = False
+        self._loop = None
+        self._tasks = []
+        self._connections = {}  # Task -> its open connection
+        self._closing = []  # Close handshakes started by stop, kept referenced until they finish
+
+    def connection_groups(self):
+        """
+        Split the configured pairs into groups of at most `streams_per_connection`.
+        """
+        symbols = list(self.handlers)
+        size = self.streams_per_connection
+        return [symbols[i:i + size] for i in range(0, len(symbols), size)]
+
+    def dispatch(self, raw):
+        """
+        Decode one combined-stream frame and hand its payload to the matching pair handler.
+        """
+        message = json.loads(raw)
+        data = message.get("data")
+        if data is None:
+            return  # Subscription acknowledgements and other control replies
+        handler = self.handlers.get(data.get("s"))
+        if handler is not None:
+            self.messages_received += 1
+            handler(data)
+
+    async def _run_connection(self, symbols):
+        ssl_context = ssl.create_default_context(cafile=certifi.where()) if self.url.startswith("wss://") else None
+        subscribe = json.dumps({
+            "method": "SUBSCRIBE",
+            "params": [f"{symbol.lower()}@ticker" for symbol in symbols],
+            "id": 1
+        })
+
+        while not self._stopped:
+            try:
+                async with connect(self.url, ssl=ssl_context, max_queue=None) as ws:
+                    self._connections[asyncio.current_task()] = ws
+                    try:
+                        await ws.send(subscribe)
+                        print(f"Subscribed to {len(symbols)} ticker streams on {self.url}")
+                        async for raw in ws:
+                            try:
+                                self.dispatch(raw)
+                            except Exception as e:
+                                print(f"Error handling stream message: {e}")
+                    finally:
+                        self._connections.pop(asyncio.current_task(), None)
+            except (WebSocketException, OSError) as e:
+                print(f"WebSocket error: {e}")
+            if self._stopped:
+                break
+            self.reconnects += 1
+            metrics.websocket_reconnects.labels('multiplex').inc()
+            print(f"Reconnecting {len(symbols)} streams in {self.reconnect_delay} seconds...")
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def run(self):
+        """
+        Run every connection in the pool until `stop` is called.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._tasks = [asyncio.create_task(self._run_connection(group)) for group in self.connection_groups()]
+        try:
+            await asyncio.gather(*self._tasks)
+        except asyncio.CancelledError:
+            pass
+
+    def stop(self):
+        """
+        Close every connection; safe to call from any thread.
+        """
+        self._stopped = True
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._close_connections)
+
+    def _close_connections(self):
+        # Open connections get a closing handshake, so the server is not left waiting on a dead socket;
+        # tasks that are connecting or waiting to reconnect are cancelled
+        for task in self._tasks:
+            ws = self._connections.get(task)
+            if ws is None:
+                task.cancel()
+            else:
+                self._closing.append(asyncio.ensure_future(ws.close()))
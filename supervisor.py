@@ -0,0 +1,367 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import argparse
+import multiprocessing as mp
+import os
+import signal
+import threading
+import time
+from multiprocessing import shared_memory
+import numpy as np
+
+class SharedMarketState:
+    """
+    Latest tick, latest bars and ingest counters of every pair in one shared-memory block.
+
+    The supervisor creates the block and each worker process publishes the rows of its own
+    pairs, so any process can read every pair's prices without asking the owning worker.
+    Each row carries a version counter that is odd while the row is being written;
+    readers retry until they see the same even version before and after copying a row.
+    """
+
+    def __init__(self, pairs, depth=200, name=None):
+        self.pairs = [pair.upper() for pair in pairs]
+        self.index = {pair: i for i, pair in enumerate(self.pairs)}
+        self.depth = depth
+        self.dtype = np.dtype([
+            ('version', '<i8'),
+            ('price', '<f8'),  # Latest traded price
+            ('event_time', '<i8'),  # Exchange event time (ms) of that price
+            ('bar_seq', '<i8'),  # Bars ever appended to the pair's buffer
+            ('bar_count', '<i8'),  # Valid entries in bar_times/closes
+            ('messages', '<i8'),  # Ticker payloads received, used as the pair's load
+            ('updated', '<f8'),  # Wall-clock time of the last publish; the worker's heartbeat
+            ('bar_times', '<i8', (depth,)),
+            ('closes', '<f8', (depth,)),
+        ])
+        size = max(self.dtype.itemsize * len(self.pairs), 1)
+        if name is None:
+            self.block = shared_memory.SharedMemory(create=True, size=size)
+            self.owner = True
+        else:
+            # Workers started by the supervisor share its resource tracker, which unlinks the block once, at close()
+            self.block = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.rows = np.ndarray((len(self.pairs),), dtype=self.dtype, buffer=self.block.buf)
+        if self.owner:
+            self.rows[:] = np.zeros(len(self.pairs), dtype=self.dtype)
+
+    @classmethod
+    def attach(cls, name, pairs, depth=200):
+        return cls(pairs, depth, name)
+
+    @property
+    def name(self):
+        return self.block.name
+
+    def publish(self, pair, price, event_time, messages, bars=None):
+        """
+        Update a pair's row. `bars` is (bar_seq, timestamps, closes) and is only copied when given.
+        """
+        row = self.rows[self.index[pair.upper()]]
+        row['version'] += 1
+        if price is not None:
+            row['price'] = price
+            row['event_time'] = event_time
+        row['messages'] = messages
+        row['updated'] = time.time()
+        if bars is not None:
+            bar_seq, timestamps, closes = bars
+            count = min(len(closes), self.depth)
+            row['bar_seq'] = bar_seq
+            row['bar_count'] = count
+            row['bar_times'][:count] = np.asarray(timestamps[-count:], dtype='datetime64[ms]').view(np.int64) if count else []
+            row['closes'][:count] = closes[-count:]
+        row['version'] += 1
+
+    def read(self, pair):
+        """
+        Return a consistent copy of a pair's row as a dict, with its bars as NumPy arrays.
+        """
+        row = self.rows[self.index[pair.upper()]]
+        while True:
+            version = int(row['version'])
+            if version % 2 == 0:
+                copy = row.copy()
+                if int(row['version']) == version:
+                    break
+            time.sleep(0)
+        count = int(copy['bar_count'])
+        return {
+            'price': float(copy['price']),
+            'event_time': int(copy['event_time']),
+            'bar_seq': int(copy['bar_seq']),
+            'messages': int(copy['messages']),
+            'updated': float(copy['updated']),
+            'timestamps': copy['bar_times'][:count].view('datetime64[ms]'),
+            'closes': copy['closes'][:count],
+        }
+
+    def latest_prices(self):
+        """
+        Latest price of every pair that has one, keyed by symbol.
+        """
+        prices = self.rows['price'].copy()
+        return {pair: float(prices[i]) for i, pair in enumerate(self.pairs) if prices[i]}
+
+    def close(self):
+        self.rows = None
+        self.block.close()
+        if self.owner:
+            self.block.unlink()
+
+def shard_pairs(pairs, workers):
+    """
+    Initial round-robin assignment of pairs to `workers` shards.
+    """
+    return [list(pairs[w::workers]) for w in range(workers)]
+
+def rebalance_shards(assignment, loads, imbalance=1.25):
+    """
+    Move pairs from the busiest shard to the idlest one until their loads are within `imbalance`
+    of each other, choosing each move to halve the gap. Only a few pairs move, so only the shards
+    that actually change need to be restarted.
+
+    Parameters:
+    assignment (list): Pairs of each shard.
+    loads (dict): Maps each pair to its load, e.g. messages per second.
+
+    Returns a new assignment; the input is left untouched.
+    """
+    shards = [list(shard) for shard in assignment]
+    for _ in range(sum(len(shard) for shard in shards)):
+        totals = [sum(loads.get(pair, 0.0) for pair in shard) for shard in shards]
+        busiest = int(np.argmax(totals))
+        idlest = int(np.argmin(totals))
+        gap = totals[busiest] - totals[idlest]
+        if totals[busiest] <= imbalance * totals[idlest] or gap <= 0:
+            break
+        candidates = [pair for pair in shards[busiest] if 0 < loads.get(pair, 0.0) < gap]
+        if not candidates:
+            break
+        pair = min(candidates, key=lambda p: abs(loads[p] - gap / 2))
+        shards[busiest].remove(pair)
+        shards[idlest].append(pair)
+    return shards
+
+def run_worker(shard, pairs, state_name, all_pairs, depth=200, publish_interval=0.5, stream_url=None, trade=True):
+    """
+    Worker process entry point: ingest and trade `pairs` as main.py does, and publish their
+    prices and bars into the shared market state. Exits non-zero if any of its threads dies,
+    so the supervisor restarts it instead of leaving a pair silently unattended.
+    """
+    # Imported here so each spawned process creates its own clients, engine and writer threads
+    from data_request import run_multiplexed, bar_builders
+    from stream_client import BINANCE_STREAM_URL
+    from price_buffer import get_buffer
+    from backfill import warm_start
+    from tick_archive import tick_archive
+    from state_store import state_store
+    from storage import database_writer
+    from performance import performance_table_create
+
+    state = SharedMarketState.attach(state_name, all_pairs, depth)
+
+    def shutdown(signum, frame):
+        # Persist what is still queued in memory before the supervisor stops or moves this shard
+        try:
+            tick_archive.flush()
+            state_store.flush(5)
+            database_writer.flush(5)
+        except Exception as e:
+            print(f"Worker {shard}: error flushing on shutdown: {e}")
+        os._exit(0)
+
+    signal.signal(signal.SIGTERM, shutdown)
+    print(f"Worker {shard} (pid {os.getpid()}) starting with {len(pairs)} pairs")
+
+    performance_table_create()
+    warm_start(pairs)
+    # Each worker serves its own metrics on METRICS_PORT + shard; 0 disables them
+    metrics_port = int(os.getenv('METRICS_PORT', '9100') or 0)
+    if metrics_port:
+        import metrics
+        metrics.register_runtime_collectors()
+        if trade:
+            from execution import order_gateway
+            from portfolio import portfolio
+            metrics.register_gateway_collectors(order_gateway)
+            metrics.register_portfolio_collectors(portfolio)
+        try:
+            metrics.start_http_server(metrics_port + shard)
+        except OSError as e:
+            print(f"Worker {shard}: metrics endpoint unavailable on port {metrics_port + shard}: {e}")
+    threads = [threading.Thread(target=run_multiplexed, args=(pairs, stream_url or BINANCE_STREAM_URL), daemon=True)]
+    if trade:
+        from execution import start_trading_strategy
+        from portfolio import portfolio
+        # Workers do not see each other's positions, so each gets the share of the global cap its pairs make up
+        portfolio.set_limits(max_exposure=portfolio.max_exposure * len(pairs) / len(all_pairs))
+        threads += [threading.Thread(target=start_trading_strategy, args=(pair,), daemon=True) for pair in pairs]
+    for t in threads:
+        t.start()
+
+    published_seq = {}
+    while True:
+        for pair in pairs:
+            price_buffer = get_buffer(pair)
+            price, event_time = price_buffer.last_tick
+            builder = bar_builders.get(pair.upper())
+            messages = builder.stats.messages if builder else 0
+            bars = None
+            if price_buffer.seq != published_seq.get(pair):
+                bars = price_buffer.snapshot()
+                published_seq[pair] = bars[0]
+            state.publish(pair, price, event_time, messages, bars)
+        dead = [t.name for t in threads if not t.is_alive()]
+        if dead:
+            print(f"Worker {shard}: threads {', '.join(dead)} died; exiting so the supervisor restarts the shard")
+            os._exit(1)
+        time.sleep(publish_interval)
+
+class Supervisor:
+    """
+    Runs pairs across several worker processes, each with its own ingest loop, strategy threads
+    and interpreter, so parsing and strategy work scale with cores instead of sharing one GIL.
+
+    The supervisor restarts workers that exit or stop publishing heartbeats, and periodically
+    moves pairs from the busiest worker to the idlest one based on their message rates.
+    A pair moving between workers resumes from its state snapshot and the tick archive.
+    """
+
+    def __init__(self, pairs, workers=None, depth=200, publish_interval=0.5, heartbeat_timeout=60,
+                 rebalance_interval=300, imbalance=1.25, restart_delay=5, stream_url=None, trade=True):
+        self.pairs = [pair.upper() for pair in pairs]
+        self.workers = min(workers or os.cpu_count() or 1, len(self.pairs))
+        self.depth = depth
+        self.publish_interval = publish_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.rebalance_interval = rebalance_interval
+        self.imbalance = imbalance
+        self.restart_delay = restart_delay
+        self.stream_url = stream_url
+        self.trade = trade
+        self.assignment = shard_pairs(self.pairs, self.workers)
+        self.state = SharedMarketState(self.pairs, depth)
+        self.processes = [None] * self.workers
+        self.started_at = [0.0] * self.workers
+        self.restarts = [0] * self.workers
+        self._context = mp.get_context('spawn')
+        self._load_mark = (time.time(), self.state.rows['messages'].copy())
+        self._stopping = False
+
+    def start_worker(self, w):
+        process = self._context.Process(
+            target=run_worker, name=f"worker-{w}",
+            args=(w, self.assignment[w], self.state.name, self.pairs, self.depth, self.publish_interval, self.stream_url, self.trade))
+        process.start()
+        self.processes[w] = process
+        self.started_at[w] = time.time()
+
+    def stop_worker(self, w, timeout=15):
+        process = self.processes[w]
+        if process is None:
+            return
+        process.terminate()  # SIGTERM: the worker flushes its queues and exits
+        process.join(timeout)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        self.processes[w] = None
+
+    def start(self):
+        for w in range(self.workers):
+            self.start_worker(w)
+
+    def check_workers(self):
+        """
+        Restart workers that have exited or whose pairs have not been published for heartbeat_timeout.
+        """
+        now = time.time()
+        for w, process in enumerate(self.processes):
+            if process is not None and process.is_alive():
+                rows = [self.state.index[pair] for pair in self.assignment[w]]
+                last_heartbeat = max(self.started_at[w], float(self.state.rows['updated'][rows].max()) if rows else now)
+                if now - last_heartbeat <= self.heartbeat_timeout:
+                    continue
+                print(f"Worker {w} missed heartbeats for {now - last_heartbeat:.0f}s; restarting it")
+                self.stop_worker(w)
+            elif process is not None:
+                print(f"Worker {w} exited with code {process.exitcode}; restarting it")
+                process.join()
+                self.processes[w] = None
+            if now - self.started_at[w] < self.restart_delay:
+                continue  # Don't restart a crash-looping worker more often than every restart_delay
+            self.restarts[w] += 1
+            self.start_worker(w)
+
+    def pair_loads(self):
+        """
+        Messages per second of every pair since the previous call.
+        """
+        now = time.time()
+        messages = self.state.rows['messages'].copy()
+        since, previous = self._load_mark
+        self._load_mark = (now, messages)
+        # A restarted worker starts counting from zero again
+        received = np.where(messages >= previous, messages - previous, messages)
+        rates = received / max(now - since, 1e-9)
+        return {pair: float(rates[i]) for i, pair in enumerate(self.pairs)}
+
+    def rebalance(self):
+        """
+        Reassign pairs by load and restart only the workers whose shards changed.
+        """
+        new_assignment = rebalance_shards(self.assignment, self.pair_loads(), self.imbalance)
+        changed = [w for w in range(self.workers) if set(new_assignment[w]) != set(self.assignment[w])]
+        if not changed:
+            return []
+        print(f"Rebalancing pairs across workers {changed}")
+        # Stop every affected worker first so no pair is ever traded by two processes at once
+        for w in changed:
+            self.stop_worker(w)
+        self.assignment = new_assignment
+        for w in changed:
+            self.start_worker(w)
+        return changed
+
+    def run(self):
+        self.start()
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda *_: self.stop())
+        last_rebalance = time.time()
+        try:
+            while not self._stopping:
+                time.sleep(1)
+                self.check_workers()
+                if self.rebalance_interval and time.time() - last_rebalance >= self.rebalance_interval:
+                    self.rebalance()
+                    last_rebalance = time.time()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def stop(self):
+        self._stopping = True
+
+    def close(self):
+        for w in range(self.workers):
+            self.stop_worker(w)
+        self.state.close()
+
+if __name__ == "__main__":
+    from strategies import load_strategy_config, configured_pairs
+
+    parser = argparse.ArgumentParser(description="Run ingestion and trading for many pairs across worker processes.")
+    parser.add_argument('--pairs', nargs='+', help="Pairs to run; defaults to every pair in the strategy configuration")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes; defaults to the CPU count")
+    parser.add_argument('--rebalance-interval', type=float, default=300, help="Seconds between load rebalances; 0 disables them")
+    parser.add_argument('--stream-url', default=None, help="Combined-stream WebSocket URL, e.g. a replay_server")
+    parser.add_argument('--ingest-only', action='store_true', help="Ingest and archive without running strategies")
+    args = parser.parse_args()
+
+    pairs = args.pairs or configured_pairs(load_strategy_config())
+    Supervisor(pairs, args.workers, rebalance_interval=args.rebalance_interval,
+               stream_url=args.stream_url, trade=not args.ingest_only).run()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from backtest import load_prices, run_backtest
+from bar_store import BAR_INTERVAL
+
+# Strategy settings swept by default; these are the values hard-coded in execution.py
+DEFAULT_GRID = {
+    'short_window': [9],
+    'long_windows': [(20, 50, 100)],
+    'take_profit': [0.01],
+    'trailing_stop': [0.013],
+    'notional': [50],
+}
+
+def parameter_grid(**options):
+    """
+    Expand lists of values per setting into every combination, e.g. take_profit=[0.005, 0.01].
+    Settings that are not given keep their default value.
+    """
+    grid = dict(DEFAULT_GRID)
+    grid.update(options)
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+class SharedPriceArrays:
+    """
+    Copies each pair's price arrays into shared memory once so every worker process can
+    map them as NumPy views instead of receiving its own pickled copy.
+    """
+
+    def __init__(self, prices):
+        """
+        Parameters:
+        prices (dict): Maps a pair to its (timestamps, closes) arrays.
+        """
+        self.blocks = []
+        self.spec = {}
+        for pair, (timestamps, closes) in prices.items():
+            arrays = (np.asarray(timestamps, dtype='datetime64[ms]').view(np.int64), np.asarray(closes, dtype=np.float64))
+            names = []
+            for array in arrays:
+                block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+                self.blocks.append(block)
+                names.append(block.name)
+            self.spec[pair] = (names[0], names[1], len(closes))
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# Price views attached in each worker process, keyed by pair
+_worker_prices = {}
+_worker_blocks = []
+
+def _attach(spec):
+    """
+    Worker initializer: map the shared price arrays without copying them.
+    """
+    for pair, (timestamps_name, closes_name, length) in spec.items():
+        views = []
+        for name, dtype in ((timestamps_name, np.int64), (closes_name, np.float64)):
+            # Pool workers share the parent's resource tracker, and the parent unlinks the blocks it created
+            block = shared_memory.SharedMemory(name=name)
+            _worker_blocks.append(block)
+            views.append(np.ndarray((length,), dtype=dtype, buffer=block.buf))
+        _worker_prices[pair] = (views[0].view('datetime64[ms]'), views[1])
+
+def max_drawdown(profit_loss):
+    """
+    Largest peak-to-trough fall of the cumulative profit curve, starting from zero.
+    """
+    equity = np.concatenate(([0.0], np.cumsum(profit_loss)))
+    return float(np.max(np.maximum.accumulate(equity) - equity))
+
+def _evaluate(task):
+    pair, start, end, params = task
+    timestamps, closes = _worker_prices[pair]
+    records = run_backtest(timestamps[start:end], closes[start:end], pair, **params)
+    profit_loss = records['profit_loss'].to_numpy()
+    result = {'pair': pair, 'start': timestamps[start] if end > start else None, 'end': timestamps[end - 1] if end > start else None}
+    result.update(params)
+    result.update({
+        'trades': len(records),
+        'pnl': float(profit_loss.sum()),
+        'win_rate': float((profit_loss > 0).mean()) if len(records) else np.nan,
+        'max_drawdown': max_drawdown(profit_loss),
+    })
+    return result
+
+def run_sweep(prices, grid, ranges=None, workers=None):
+    """
+    Backtest every parameter combination on every pair and historical range in a process pool.
+
+    Parameters:
+    prices (dict): Maps a pair to its (timestamps, closes) arrays.
+    grid (list): Parameter dicts accepted by backtest.run_backtest, e.g. from parameter_grid().
+    ranges (list): (start, end) datetime pairs to evaluate separately; the full series by default.
+    workers (int): Number of worker processes; defaults to the CPU count.
+
+    Returns a DataFrame ranked by PnL with win rate and max drawdown per run.
+    """
+    tasks = []
+    for pair, (timestamps, _) in prices.items():
+        timestamps = np.asarray(timestamps, dtype='datetime64[ms]')
+        for start, end in ranges or [(None, None)]:
+            lo = 0 if start is None else int(np.searchsorted(timestamps, np.datetime64(start, 'ms')))
+            hi = len(timestamps) if end is None else int(np.searchsorted(timestamps, np.datetime64(end, 'ms'), side='right'))
+            tasks.extend((pair, lo, hi, params) for params in grid)
+
+    with SharedPriceArrays(prices) as shared:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_attach, initargs=(shared.spec,)) as pool:
+            results = list(pool.map(_evaluate, tasks, chunksize=max(1, len(tasks) // (4 * (workers or os.cpu_count())))))
+
+    return pd.DataFrame(results).sort_values('pnl', ascending=False).reset_index(drop=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep MA-crossover strategy settings across pairs.")
+    parser.add_argument('source', help="Database URL, or a CSV/Parquet file when sweeping a single pair")
+    parser.add_argument('--pairs', nargs='+', default=['BTCUSDT'])
+    parser.add_argument('--timeframe', type=int, default=BAR_INTERVAL, help="Timeframe (seconds) of the bars to read from the bars table")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    prices = {pair: load_prices(args.source, pair, args.timeframe) for pair in args.pairs}
+    grid = parameter_grid(
+        short_window=[5, 9, 12],
+        take_profit=[0.005, 0.01, 0.015],
+        trailing_stop=[0.008, 0.013, 0.02],
+    )
+    print(run_sweep(prices, grid, workers=args.workers).head(20).to_string())
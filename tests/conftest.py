@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# Keep the database and the tick archive out of the working tree; set before the modules read them at import
+_scratch = tempfile.mkdtemp(prefix="tradebot-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_scratch, 'TradingData.db')}")
+os.environ.setdefault("TICK_ARCHIVE_DIR", os.path.join(_scratch, "tick_archive"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,101 @@
+import asyncio
+import pytest
+from replay_server import ReplayServer
+from stream_client import MultiplexedStreamClient
+from data_request import BarBuilder
+
+START = 1_700_000_000_000  # A multiple of the 20s bar interval, in ms
+TICKS = 60  # One tick per second per pair: bars 0 and 1 close, bar 2 is still open
+
+def recording(pairs):
+    """
+    Ticker payloads for every pair, interleaved by event time, each with its own price path.
+    """
+    messages = []
+    for i in range(TICKS):
+        for n, pair in enumerate(pairs):
+            messages.append({"e": "24hrTicker", "E": START + i * 1000, "s": pair, "c": f"{100 * (n + 1) + i * 0.5:.2f}", "v": "1000"})
+    return messages
+
+def run_client(server, handlers, until, **kwargs):
+    """
+    Run a client against the replay server until `until(client)` holds after a message, or fail after a timeout.
+    """
+    def wrap(handler):
+        def handle(data):
+            handler(data)
+            if until(client):
+                client.stop()
+        return handle
+
+    client = MultiplexedStreamClient({pair: wrap(handler) for pair, handler in handlers.items()}, server.url, **kwargs)
+    asyncio.run(asyncio.wait_for(client.run(), timeout=10))
+    return client
+
+@pytest.fixture
+def server():
+    def start(messages):
+        replay = ReplayServer(messages)
+        replay.start()
+        servers.append(replay)
+        return replay
+
+    servers = []
+    yield start
+    for replay in servers:
+        replay.stop()
+
+def test_each_pair_handler_gets_its_own_ticks_in_order(server):
+    pairs = ["AAAUSDT", "BBBUSDT", "CCCUSDT"]
+    messages = recording(pairs)
+    replay = server(messages)
+    received = {pair: [] for pair in pairs}
+
+    # Two pairs per connection: the three pairs are spread over a pool of two sockets
+    client = run_client(replay, {pair: received[pair].append for pair in pairs},
+                        until=lambda client: client.messages_received == len(messages), streams_per_connection=2)
+
+    assert len(client.connection_groups()) == 2
+    for pair in pairs:
+        assert received[pair] == [message for message in messages if message["s"] == pair]
+
+def test_bar_builders_get_parsed_ticks_and_bars(server):
+    pairs = ["DDDUSDT", "EEEUSDT"]
+    messages = recording(pairs)
+    replay = server(messages)
+    builders = {pair: BarBuilder(pair, 200, 20) for pair in pairs}
+
+    run_client(replay, {pair: builders[pair].on_message for pair in pairs},
+               until=lambda client: client.messages_received == len(messages))
+
+    for pair in pairs:
+        builder = builders[pair]
+        closes = [float(message["c"]) for message in messages if message["s"] == pair]
+        _, bars = builder.price_buffer.latest()
+        # Each closed bar holds the last price of its 20 seconds
+        assert bars.tolist() == [closes[19], closes[39]]
+        assert builder.stats.messages == TICKS
+        assert builder.stats.bars == 2
+        assert builder.price_buffer.last_tick == (closes[-1], START + (TICKS - 1) * 1000)
+
+def test_ticks_replayed_after_a_reconnect_are_dropped(server):
+    pair = "FFFUSDT"
+    messages = recording([pair])
+    replay = server(messages)
+    builder = BarBuilder(pair, 200, 20)
+
+    # The server closes the connection after each replay, so the client reconnects and receives every tick again
+    client = run_client(replay, {pair: builder.on_message},
+                        until=lambda client: client.messages_received == 2 * len(messages), reconnect_delay=0.01)
+
+    assert client.reconnects >= 1
+    _, bars = builder.price_buffer.latest()
+    closes = [float(message["c"]) for message in messages]
+    assert bars.tolist() == [closes[19], closes[39]]
+    assert builder.stats.messages == 2 * TICKS
+    assert builder.stats.bars == 2
+    # Replayed ticks of closed bars are late, earlier ticks of the open bar are stale; the last one is a harmless repeat
+    assert builder.stats.late == 40
+    assert builder.stats.stale == 19
+    assert builder.candles.late == 0
+    assert builder.price_buffer.last_tick == (closes[-1], START + (TICKS - 1) * 1000)
@@ -0,0 +1,218 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+import numpy as np
+
+# One fixed-width record per tick: event time (ms since the epoch), price, volume (NaN when the feed has none)
+TICK_DTYPE = np.dtype([('time', '<i8'), ('price', '<f8'), ('volume', '<f8')])
+INDEX_STRIDE = 4096  # The sparse index keeps the time of every INDEX_STRIDE-th row
+DAY_MS = 86400000
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+ARCHIVE_DIR = os.getenv('TICK_ARCHIVE_DIR', os.path.join(basedir, 'tick_archive'))
+
+class TickArchive:
+    """
+    Append-only columnar archive of every tick, per pair, in daily (UTC) segment files.
+
+    Each segment `<root>/<PAIR>/<YYYYMMDD>.ticks` is a flat array of TICK_DTYPE records with a
+    sidecar `.idx` holding the time of every INDEX_STRIDE-th row. Appends are buffered in memory
+    and written by a background thread; range reads binary-search the sparse index and then
+    one stride of rows, and return zero-copy numpy.memmap views. No database is involved.
+    """
+
+    def __init__(self, root=ARCHIVE_DIR, flush_interval=1.0):
+        self.root = root
+        self.flush_interval = flush_interval
+        self.out_of_order = 0  # Ticks older than the last archived one for their pair, dropped
+        self._pending = {}
+        self._last_time = {}
+        self._rows = {}  # (pair, day) -> rows written to the segment
+        self._maps = {}  # (pair, day) -> (rows, segment memmap, index memmap)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._thread = None
+
+    def segment_path(self, pair, day, suffix='.ticks'):
+        date = datetime.fromtimestamp(day * DAY_MS / 1000, tz=timezone.utc)
+        return os.path.join(self.root, pair.upper(), f"{date:%Y%m%d}{suffix}")
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="tick-archive", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing tick archive: {e}")
+
+    def append(self, pair, event_time, price, volume=np.nan):
+        """
+        Queue one tick; O(1) and never touches the disk on the caller's thread.
+        """
+        with self._lock:
+            if event_time < self._last_time.get(pair, event_time):
+                self.out_of_order += 1
+                return
+            self._last_time[pair] = event_time
+            self._pending.setdefault(pair, []).append((event_time, price, volume))
+
+    def flush(self):
+        """
+        Write all queued ticks to their segments.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        with self._write_lock:
+            for pair, ticks in pending.items():
+                records = np.array(ticks, dtype=TICK_DTYPE)
+                days = records['time'] // DAY_MS
+                bounds = np.concatenate(([0], np.flatnonzero(np.diff(days)) + 1, [len(records)]))
+                for lo, hi in zip(bounds[:-1], bounds[1:]):
+                    self._write_segment(pair.upper(), int(days[lo]), records[lo:hi])
+
+    def _segment_rows(self, pair, day):
+        key = (pair, day)
+        if key not in self._rows:
+            self._rows[key] = self._repair_segment(pair, day)
+        return self._rows[key]
+
+    def _repair_segment(self, pair, day):
+        """
+        Make a segment safe to append to after a crash or kill mid-write: drop a trailing partial record,
+        so later records stay aligned, and rewrite the index from the segment itself. Returns the row count.
+        """
+        path = self.segment_path(pair, day)
+        if not os.path.exists(path):
+            return 0
+        size = os.path.getsize(path)
+        rows = size // TICK_DTYPE.itemsize
+        if size != rows * TICK_DTYPE.itemsize:
+            print(f"Truncating a partial tick record at the end of {path}")
+            os.truncate(path, rows * TICK_DTYPE.itemsize)
+        index_path = self.segment_path(pair, day, '.idx')
+        times = np.memmap(path, dtype=TICK_DTYPE, mode='r', shape=(rows,))['time'][::INDEX_STRIDE] if rows else np.empty(0, dtype='<i8')
+        with open(index_path + '.tmp', 'wb') as f:
+            f.write(np.ascontiguousarray(times, dtype='<i8').tobytes())
+        os.replace(index_path + '.tmp', index_path)
+        return rows
+
+    def _write_segment(self, pair, day, records):
+        rows = self._segment_rows(pair, day)
+        path = self.segment_path(pair, day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'ab') as f:
+            f.write(records.tobytes())
+
+        # Index entries for every stride boundary that falls inside the new rows
+        first = -(-rows // INDEX_STRIDE) * INDEX_STRIDE
+        positions = np.arange(first, rows + len(records), INDEX_STRIDE)
+        if len(positions):
+            with open(self.segment_path(pair, day, '.idx'), 'ab') as f:
+                f.write(records['time'][positions - rows].astype('<i8').tobytes())
+        self._rows[(pair, day)] = rows + len(records)
+
+    def days(self, pair):
+        """
+        Return the UTC day numbers that have a segment for the pair, oldest first.
+        """
+        directory = os.path.join(self.root, pair.upper())
+        if not os.path.isdir(directory):
+            return []
+        days = []
+        for name in os.listdir(directory):
+            if name.endswith('.ticks'):
+                date = datetime.strptime(name[:-6], "%Y%m%d").replace(tzinfo=timezone.utc)
+                days.append(int(date.timestamp() * 1000) // DAY_MS)
+        return sorted(days)
+
+    def _open_segment(self, pair, day):
+        """
+        Map a segment and its index, reusing the maps until the segment grows.
+        """
+        path = self.segment_path(pair, day)
+        if not os.path.exists(path):
+            return None, None
+        rows = os.path.getsize(path) // TICK_DTYPE.itemsize
+        key = (pair, day)
+        cached = self._maps.get(key)
+        if cached is not None and cached[0] == rows:
+            return cached[1], cached[2]
+        if rows == 0:
+            return None, None
+        segment = np.memmap(path, dtype=TICK_DTYPE, mode='r', shape=(rows,))
+        index_path = self.segment_path(pair, day, '.idx')
+        index_rows = os.path.getsize(index_path) // 8 if os.path.exists(index_path) else 0
+        if index_rows == -(-rows // INDEX_STRIDE):
+            index = np.memmap(index_path, dtype='<i8', mode='r', shape=(index_rows,))
+        else:
+            # The index is mid-write or was left short by a crash; rebuild it from the segment
+            index = np.array(segment['time'][::INDEX_STRIDE])
+        self._maps[key] = (rows, segment, index)
+        return segment, index
+
+    @staticmethod
+    def _locate(segment, index, t, side):
+        """
+        Position of `t` in the segment's time column: a binary search over the sparse index,
+        then one over at most a stride of rows.
+        """
+        n = len(segment)
+        b = int(np.searchsorted(index, t, side))
+        lo = max(b - 1, 0) * INDEX_STRIDE
+        hi = n if b >= len(index) else min(b * INDEX_STRIDE + 1, n)
+        return lo + int(np.searchsorted(segment['time'][lo:hi], t, side))
+
+    def iter_range(self, pair, start, end):
+        """
+        Yield zero-copy memmap views of the ticks with start <= time <= end (ms), one per daily segment.
+        """
+        pair = pair.upper()
+        for day in self.days(pair):
+            if day < start // DAY_MS or day > end // DAY_MS:
+                continue
+            segment, index = self._open_segment(pair, day)
+            if segment is None:
+                continue
+            lo = self._locate(segment, index, start, 'left')
+            hi = self._locate(segment, index, end, 'right')
+            if hi > lo:
+                yield segment[lo:hi]
+
+    def read_range(self, pair, start, end):
+        """
+        Return the ticks with start <= time <= end (ms) as one array.
+        Zero-copy when the range falls in a single day; concatenated otherwise.
+        """
+        parts = list(self.iter_range(pair, start, end))
+        if not parts:
+            return np.empty(0, dtype=TICK_DTYPE)
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts)
+
+    def last(self, pair, n):
+        """
+        Return up to the last `n` archived ticks for a pair, oldest first.
+        """
+        parts = []
+        remaining = n
+        for day in reversed(self.days(pair)):
+            segment, _ = self._open_segment(pair.upper(), day)
+            if segment is None:
+                continue
+            parts.append(segment[max(len(segment) - remaining, 0):])
+            remaining -= len(parts[-1])
+            if remaining <= 0:
+                break
+        if not parts:
+            return np.empty(0, dtype=TICK_DTYPE)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts[::-1])
+
+tick_archive = TickArchive()